@@ -1,16 +1,22 @@
-
 import os
-import time
+import sys
+import asyncio
 import logging
 import argparse
 import traceback
+import numpy as np
 
 from tqdm import tqdm
 from dotenv import load_dotenv
+from aiolimiter import AsyncLimiter
+from contextlib import nullcontext
+from concurrent.futures import ThreadPoolExecutor
 
 from utils.data_extractor import DataExtractor
 from opwebui.api_client import OpenWebUIClient
 from utils.query_enhancer import QueryEnchancer
+from utils.semantic_cache import SemanticCache
+from metrics.candidate_filter import BM25CandidateFilter, CandidateFilter
 from metrics.metrics_evaluator import ScoreCalculator, SolutionMatcher
 from utils.evaluation_utils import (
     generate_report,
@@ -26,6 +32,9 @@ QUESTION_PATH = os.path.join(DATA_PATH, os.getenv("QUESTION_EXCEL"))
 SOLUTION_PATH = os.path.join(DATA_PATH, os.getenv("SOLUTION_EXCEL"))
 
 QUESTION_SHEET_NAME = os.getenv("QUESTION_SHEET_NAME")
+SEMANTIC_CACHE_PATH = os.path.join(DATA_PATH, ".sem_cache")
+EMBEDDING_CACHE_PATH = os.path.join(DATA_PATH, ".emb_cache")
+CANDIDATE_CACHE_PATH = os.path.join(DATA_PATH, ".candidate_cache")
 
 
 if not DATA_PATH or not QUESTION_PATH or not SOLUTION_PATH:
@@ -45,33 +54,220 @@ def display_results(question, model_response, best_solution, metrics):
     # Log the best match
     logging.info(f"Best match for question {question.id} with F1={metrics['bert_f1']:.4f}")
     
-    # Print formatted output
-    print(f"\n{'='*50}")
-    print(f"=== Question {question.id} ===")
-    print(f"Issue: {question.issue[:100]}..." if len(question.issue) > 100 else f"Issue: {question.issue}")
-    
-    print(f"\n=== Model Response ===")
-    response_preview = model_response[:300] + "..." if len(model_response) > 300 else model_response
-    print(response_preview)
-    
-    print(f"\n=== Best Matching Solution ({best_solution.id}) ===")
-    print(f"Title: {best_solution.title}")
+    # Build the whole block first and write it in one go
+    parts = [
+        f"\n{'='*50}",
+        f"=== Question {question.id} ===",
+        f"Issue: {question.issue[:100]}..." if len(question.issue) > 100 else f"Issue: {question.issue}",
+        "\n=== Model Response ===",
+        model_response[:300] + "..." if len(model_response) > 300 else model_response,
+        f"\n=== Best Matching Solution ({best_solution.id}) ===",
+        f"Title: {best_solution.title}"
+    ]
     
-    # Print up to 5 steps
-    for j, step in enumerate(best_solution.steps[:5]):
-        print(f"  {j+1}. {step}")
+    # Show up to 5 steps
+    parts.extend(f"  {j+1}. {step}" for j, step in enumerate(best_solution.steps[:5]))
     
     # Show ellipsis if there are more steps
     if len(best_solution.steps) > 5:
-        print(f"  ...(+{len(best_solution.steps) - 5} more steps)")
+        parts.append(f"  ...(+{len(best_solution.steps) - 5} more steps)")
     
-    # Print metrics
-    print(f"\nEvaluation Metrics:")
-    print(f"  BERTScore: {metrics['bert_f1']:.4f} (P={metrics['bert_precision']:.4f}, R={metrics['bert_recall']:.4f})")
-    print(f"  F1 Score:  {metrics['trad_f1']:.4f}")
-    print(f"  BLEU:      {metrics['bleu']:.4f}")
+    # Show metrics
+    parts.extend([
+        "\nEvaluation Metrics:",
+        f"  BERTScore: {metrics['bert_f1']:.4f} (P={metrics['bert_precision']:.4f}, R={metrics['bert_recall']:.4f})",
+        f"  F1 Score:  {metrics['trad_f1']:.4f}",
+        f"  BLEU:      {metrics['bleu']:.4f}",
+        f"\n{'='*50}\n"
+    ])
+    
+    sys.stdout.write("\n".join(parts) + "\n")
+
+
+def score_question(args, question, prompt, model_response, solutions, matcher, query_enchancer):
+    """
+    Score a model response against the question's reference solutions.
     
-    print(f"\n{'='*50}\n")
+    Args:
+        args: Parsed command line arguments
+        question: The Question object
+        prompt: The prompt that was sent to the model
+        model_response: The model's generated response text
+        solutions: Object array of all Solution objects
+        matcher: SolutionMatcher used to pick the best solution
+        query_enchancer: QueryEnchancer used for post-processing
+    
+    Returns:
+        dict: Report entry for the question, or None if it could not be scored
+    """
+    # Find the associated solution(s) based on solutions_used or ai_solutions_used field
+    if len(question.ai_solutions_used) > 0:
+        # Prefer AI solutions if specified
+        solution_indices = question.ai_solutions_used
+        logging.info(f"Using AI solutions {solution_indices} for question {question.id}")
+    elif len(question.solutions_used) > 0:
+        # Fall back to regular solutions
+        solution_indices = question.solutions_used
+        logging.info(f"Using regular solutions {solution_indices} for question {question.id}")
+    else:
+        # If no solutions are marked, compare with all solutions
+        solution_indices = np.arange(1, len(solutions) + 1)  # Use 1-based indices to match Excel
+        logging.info(f"No specific solution marked for question {question.id}, comparing with all solutions")
+
+    # Filter out invalid indices (ensure they're 0-based for array indexing)
+    valid_indices = np.asarray(solution_indices, dtype=np.intp) - 1
+    valid_indices = valid_indices[(valid_indices >= 0) & (valid_indices < len(solutions))]
+    solutions_to_compare = solutions[valid_indices].tolist()
+
+    # Skip if no valid solutions to compare against
+    if not solutions_to_compare:
+        logging.warning(f"No valid solutions found for question {question.id}")
+        return None
+
+    best_solution, metrics = matcher.find_best_solution(
+        model_response, 
+        solutions_to_compare
+    )
+
+    question.bert_score = metrics['bert_f1']
+    question.f1_score = metrics['trad_f1']
+    question.bleu_score = metrics['bleu']
+
+    # Check quality and potentially improve prompt
+    is_acceptable, feedback = assess_response_quality(
+        metrics,
+        bert_threshold=args.bert_threshold,
+        f1_threshold=args.f1_threshold,
+        bleu_threshold=args.bleu_threshold,
+        combined_threshold=args.combined_threshold
+    )
+
+    # INCOMPLETE - for future use
+    if not is_acceptable and args.post_process:
+        # Log the feedback and warning
+        logging.warning(f"Question {question.id} response quality below threshold")
+        logging.info(f"{feedback}\n")
+        
+        # Generate improved prompt for future use
+        improved_prompt = query_enchancer.post_process(
+            prompt, 
+            metrics, 
+            bert_threshold=args.bert_threshold,
+            f1_threshold=args.f1_threshold,
+            bleu_threshold=args.bleu_threshold,
+            combined_threshold=args.combined_threshold
+        )
+        logging.info(f"Post-request improved prompt: {improved_prompt[:100]}...")
+    
+    if args.verbose:
+        display_results(question, model_response, best_solution, metrics)
+
+    return {
+        'metrics': metrics,
+        'best_solution_id': best_solution.id,
+        'model_response': model_response
+    }
+
+
+async def process_questions(args, questions, solutions, client, matcher, query_enchancer, semantic_cache=None):
+    """
+    Get model responses and scores for all questions concurrently.
+    
+    API calls are bounded by --max-concurrency and rate limited to --rpm
+    requests per minute (unlimited when --rpm is 0). Scoring and semantic
+    cache lookups each run on their own worker thread so the event loop keeps
+    issuing requests while a response is being embedded or scored.
+    
+    Returns:
+        dict: Mapping of question ID to its report entry, in question order
+    """
+    total_questions = len(questions)
+    semaphore = asyncio.Semaphore(args.max_concurrency)
+    # Cache hits never acquire the limiter; --rpm 0 turns it off for local models
+    limiter = AsyncLimiter(args.rpm, 60) if args.rpm > 0 else nullcontext()
+    loop = asyncio.get_running_loop()
+    scoring_executor = ThreadPoolExecutor(max_workers=1)
+    lookup_executor = ThreadPoolExecutor(max_workers=1)
+    # Verbose output and non-interactive logs get no value from redrawing a progress bar
+    progress = tqdm(
+        total=total_questions,
+        desc="\nProcessing questions",
+        unit="question",
+        mininterval=1.0,
+        disable=args.verbose or not sys.stderr.isatty()
+    )
+
+    # Object array so each question selects its candidates with one fancy-index
+    solution_array = np.empty(len(solutions), dtype=object)
+    solution_array[:] = solutions
+
+    async def process(i, question):
+        logging.info(f"Processing question {i+1}/{total_questions} (ID: {question.id})")
+        
+        # Get model response for this question
+        prompt = question.issue
+        
+        # Enhance the query if specified
+        if args.pre_process:
+            enchanced_prompt = query_enchancer.pre_process(prompt)
+            logging.info(f"Pre-request enhanced prompt: {enchanced_prompt[:100]}...")
+            prompt = enchanced_prompt
+
+        model_response = None
+        if semantic_cache:
+            # Prompt embedding is CPU work too, keep it off the event loop
+            model_response, prompt_embedding = await loop.run_in_executor(
+                lookup_executor, semantic_cache.lookup, prompt
+            )
+
+        if model_response is not None:
+            logging.info(f"Reusing cached response for a similar prompt: {len(model_response)} chars")
+        else:
+            logging.info(f"Sending prompt to model: {prompt[:50]}...")
+            
+            async with limiter:
+                response = await client.chat_with_model_async(prompt)
+            if not response:
+                logging.error(f"No response received for question {question.id}")
+                return None
+                
+            model_response = response.choices[0].message.content
+            logging.info(f"Received model response: {len(model_response)} chars")
+
+            if semantic_cache:
+                semantic_cache.add(prompt_embedding, model_response)
+
+        return await loop.run_in_executor(
+            scoring_executor,
+            score_question,
+            args, question, prompt, model_response, solution_array, matcher, query_enchancer
+        )
+
+    async def bounded(i, question):
+        # One failed question is logged and skipped instead of cancelling the rest
+        try:
+            async with semaphore:
+                return await process(i, question)
+        except Exception as e:
+            logging.error(f"Failed to process question {question.id}: {e}")
+            logging.debug("Traceback:", exc_info=True)
+            return None
+        finally:
+            progress.update(1)
+
+    try:
+        results = await asyncio.gather(*[bounded(i, q) for i, q in enumerate(questions)])
+    finally:
+        scoring_executor.shutdown(wait=True)
+        lookup_executor.shutdown(wait=True)
+        progress.close()
+        await client.aclose()
+
+    return {
+        question.id: result
+        for question, result in zip(questions, results)
+        if result is not None
+    }
 
 
 def main():
@@ -116,11 +312,18 @@ def main():
         solutions = extractor.get_solutions()
         
         # Initialize the score calculator and matcher
-        score_calculator = ScoreCalculator()
-        matcher = SolutionMatcher(score_calculator)
-
-        # Prepare metrics storage for report generation
-        metrics_by_question = {}
+        score_calculator = ScoreCalculator(
+            embedding_cache_dir=EMBEDDING_CACHE_PATH,
+            fast_tokenize=args.fast_tokenize
+        )
+        candidate_filter = None
+        if args.prefilter_k > 0 and args.prefilter == "bm25":
+            candidate_filter = BM25CandidateFilter(top_k=args.prefilter_k)
+        elif args.prefilter_k > 0:
+            candidate_filter = CandidateFilter(top_k=args.prefilter_k, cache_path=CANDIDATE_CACHE_PATH)
+        matcher = SolutionMatcher(score_calculator, candidate_filter=candidate_filter)
+        matcher.precompute_reference_embeddings(solutions)
+        client = OpenWebUIClient(max_connections=args.max_concurrency)
 
         # Use the limit argument if provided
         if args.question_id:
@@ -131,101 +334,24 @@ def main():
         else:
             question_to_process = questions if args.limit <= 0 else questions[:args.limit]
 
-        total_questions = len(question_to_process)
         query_enchancer = QueryEnchancer()
+        semantic_cache = SemanticCache(SEMANTIC_CACHE_PATH, threshold=args.cache_threshold) if args.semantic_cache else None
 
-        for i, question in enumerate(tqdm(question_to_process, desc="\nProcessing questions", unit="question")):
-            logging.info(f"Processing question {i+1}/{total_questions} (ID: {question.id})")
-            
-            # Get model response for this question
-            client = OpenWebUIClient()
-            prompt = question.issue
-            
-            # Enhance the query if specified
-            if args.pre_process:
-                enchanced_prompt = query_enchancer.pre_process(prompt)
-                logging.info(f"Pre-request enhanced prompt: {enchanced_prompt[:100]}...")
-                prompt = enchanced_prompt
+        try:
+            metrics_by_question = asyncio.run(process_questions(
+                args,
+                question_to_process,
+                solutions,
+                client,
+                matcher,
+                query_enchancer,
+                semantic_cache
+            ))
+        finally:
+            matcher.close()
 
-            logging.info(f"Sending prompt to model: {prompt[:50]}...")
-            
-            response = client.chat_with_model(prompt)
-            if not response:
-                logging.error(f"No response received for question {question.id}")
-                continue
-                
-            model_response = response.choices[0].message.content
-            logging.info(f"Received model response: {len(model_response)} chars")
-
-            # Find the associated solution(s) based on solutions_used or ai_solutions_used field
-            if len(question.ai_solutions_used) > 0:
-                # Prefer AI solutions if specified
-                solution_indices = question.ai_solutions_used
-                logging.info(f"Using AI solutions {solution_indices} for question {question.id}")
-            elif len(question.solutions_used) > 0:
-                # Fall back to regular solutions
-                solution_indices = question.solutions_used
-                logging.info(f"Using regular solutions {solution_indices} for question {question.id}")
-            else:
-                # If no solutions are marked, compare with all solutions
-                solution_indices = list(range(1, len(solutions) + 1))  # Use 1-based indices to match Excel
-                logging.info(f"No specific solution marked for question {question.id}, comparing with all solutions")
-
-            # Filter out invalid indices (ensure they're 0-based for array indexing)
-            valid_indices = [i-1 for i in solution_indices if 1 <= i <= len(solutions)]  
-            solutions_to_compare = [solutions[i] for i in valid_indices]
-
-            # Skip if no valid solutions to compare against
-            if not solutions_to_compare:
-                logging.warning(f"No valid solutions found for question {question.id}")
-                continue
-
-            best_solution, metrics = matcher.find_best_solution(
-                model_response, 
-                solutions_to_compare
-            )
-
-            question.bert_score = metrics['bert_f1']
-            question.f1_score = metrics['trad_f1']
-            question.bleu_score = metrics['bleu']
-
-            # Store metrics for report generation
-            metrics_by_question[question.id] = {
-                'metrics': metrics,
-                'best_solution_id': best_solution.id,
-                'model_response': model_response
-            }
-
-            # Check quality and potentially improve prompt
-            is_acceptable, feedback = assess_response_quality(
-                metrics,
-                bert_threshold=args.bert_threshold,
-                f1_threshold=args.f1_threshold,
-                bleu_threshold=args.bleu_threshold,
-                combined_threshold=args.combined_threshold
-            )
-
-            # INCOMPLETE - for future use
-            if not is_acceptable and args.post_process:
-                # Log the feedback and warning
-                logging.warning(f"Question {question.id} response quality below threshold")
-                logging.info(f"{feedback}\n")
-                
-                # Generate improved prompt for future use
-                improved_prompt = query_enchancer.post_process(
-                    prompt, 
-                    metrics, 
-                    bert_threshold=args.bert_threshold,
-                    f1_threshold=args.f1_threshold,
-                    bleu_threshold=args.bleu_threshold,
-                    combined_threshold=args.combined_threshold
-                )
-                logging.info(f"Post-request improved prompt: {improved_prompt[:100]}...")
-            
-            if args.verbose:
-                display_results(question, model_response, best_solution, metrics)
-            
-            time.sleep(args.wait_time)
+        if semantic_cache:
+            semantic_cache.save()
     
         # Generate comprehensive report after all questions processed
         if metrics_by_question and not args.skip_report:
@@ -264,11 +390,23 @@ def parse_args():
     parser.add_argument("--post-process", "--post", action="store_true", help="Enable query enhancement after receiving model response")
     parser.add_argument("--verbose", "--v", action="store_true", help="Display detailed logs")
     parser.add_argument("--report-dir", "--rd", type=str, default="reports", help="Directory to save reports")
-    parser.add_argument("--wait-time", "--wt", type=float, default=1.0, help="Wait time between API calls in seconds")
+    parser.add_argument("--max-concurrency", "--mc", type=int, default=4, help="Maximum number of concurrent API calls")
+    parser.add_argument("--rpm", type=int, default=60, help="Maximum API calls per minute (0 disables rate limiting)")
     parser.add_argument("--skip-report", "--sr", action="store_true", help="Skip report generation")
     parser.add_argument("--export-excel", "--ee", action="store_true", help="Export evaluation report to Excel")
+    parser.add_argument("--semantic-cache", "--sc", action="store_true", help="Reuse model responses for semantically similar prompts")
+    parser.add_argument("--cache-threshold", "--cth", type=float, default=0.86, help="Cosine similarity required for a semantic cache hit")
+    parser.add_argument("--fast-tokenize", "--ft", action="store_true", help="Tokenize with str.split instead of NLTK for F1/BLEU (faster, slightly different scores)")
+    parser.add_argument("--prefilter-k", "--pk", type=int, default=0, help="Score only the K solutions closest to the response (0 disables)")
+    parser.add_argument("--prefilter", "--pf", choices=["minilm", "bm25"], default="minilm", help="First-pass retriever used by --prefilter-k")
 
-    return parser.parse_args()
+    args = parser.parse_args()
+    # A zero-permit semaphore would block every request forever
+    if args.max_concurrency < 1:
+        parser.error("--max-concurrency must be at least 1")
+    if args.rpm < 0:
+        parser.error("--rpm must be 0 or greater")
+    return args
 
 if __name__ == "__main__":
     main()
\ No newline at end of file
@@ -0,0 +1,231 @@
+import math
+import numpy as np
+
+from collections import Counter
+from functools import lru_cache
+
+try:
+    from numba import njit, prange
+    _NUMBA_AVAILABLE = True
+except ImportError:
+    _NUMBA_AVAILABLE = False
+
+# Below this many tokens the Counter path beats the compiled kernel's call overhead
+NUMBA_MIN_TOKENS = 64
+
+
+if _NUMBA_AVAILABLE:
+    @njit(cache=True)
+    def _ngram_hashes(ids, n, base):
+        """Sorted int64 hashes of the n-grams of a token id array."""
+        count = max(0, len(ids) - n + 1)
+        hashes = np.empty(count, dtype=np.int64)
+        for i in range(count):
+            key = 0
+            for j in range(n):
+                key = key * base + ids[i + j]
+            hashes[i] = key
+        hashes.sort()
+        return hashes
+
+    @njit(parallel=True, cache=True)
+    def _clipped_ngram_counts(cand_ids, ref_ids, max_n, base):
+        """
+        Count clipped n-gram matches of a candidate against one reference.
+
+        N-grams are hashed into a single int64 by treating the token ids as
+        digits in the given base, so base ** max_n must fit in an int64.
+        Each order is independent and runs on its own thread; matches are
+        clipped by walking the sorted candidate and reference hashes together.
+
+        Returns:
+            tuple: (numerators, denominators) arrays for orders 1..max_n
+        """
+        numerators = np.zeros(max_n, dtype=np.int64)
+        denominators = np.zeros(max_n, dtype=np.int64)
+
+        for order in prange(max_n):
+            cand = _ngram_hashes(cand_ids, order + 1, base)
+            ref = _ngram_hashes(ref_ids, order + 1, base)
+
+            matched = 0
+            i = 0
+            j = 0
+            while i < len(cand) and j < len(ref):
+                if cand[i] < ref[j]:
+                    i += 1
+                elif cand[i] > ref[j]:
+                    j += 1
+                else:
+                    # Count the run of this n-gram on both sides and keep the smaller
+                    key = cand[i]
+                    cand_run = 0
+                    while i < len(cand) and cand[i] == key:
+                        cand_run += 1
+                        i += 1
+                    ref_run = 0
+                    while j < len(ref) and ref[j] == key:
+                        ref_run += 1
+                        j += 1
+                    matched += min(cand_run, ref_run)
+
+            numerators[order] = matched
+            denominators[order] = max(1, len(cand))
+
+        return numerators, denominators
+
+
+def can_encode(vocab_size, max_n=4):
+    """Check whether n-grams over a vocabulary fit the int64 n-gram hash."""
+    return (vocab_size + 1) ** max_n < 2 ** 63
+
+
+def bleu_score(cand_ids, ref_ids, weights=(0.25, 0.25, 0.25, 0.25), base=None, k=5):
+    """
+    Sentence BLEU of integer-encoded tokens against a single reference.
+
+    Matches nltk's sentence_bleu with SmoothingFunction().method4. Requires
+    numba; check _NUMBA_AVAILABLE first.
+
+    Args:
+        cand_ids (numpy.ndarray): int64 token ids of the candidate.
+        ref_ids (numpy.ndarray): int64 token ids of the reference.
+        weights (tuple): Weights for the 1..N-gram precisions.
+        base (int): Upper bound on token ids + 1; defaults to the largest id + 1.
+        k (int): The method4 smoothing constant.
+
+    Returns:
+        float: The BLEU score.
+    """
+    max_n = len(weights)
+    if base is None:
+        base = int(max(cand_ids.max(initial=0), ref_ids.max(initial=0))) + 1
+    numerators, denominators = _clipped_ngram_counts(cand_ids, ref_ids, max_n, base)
+    return _bleu_from_counts(numerators, denominators, len(cand_ids), len(ref_ids), weights, k)
+
+
+@lru_cache(maxsize=4096)
+def ngram_counts(tokens, max_n=4):
+    """
+    Count the 1..max_n-grams of a token tuple.
+
+    Memoized, so a reference scored against many candidates is counted once.
+
+    Returns:
+        tuple: One Counter per n-gram order.
+    """
+    return tuple(
+        Counter(tuple(tokens[i:i + n]) for i in range(len(tokens) - n + 1))
+        for n in range(1, max_n + 1)
+    )
+
+
+def counter_bleu(candidate, reference, weights=(0.25, 0.25, 0.25, 0.25), k=5):
+    """
+    Sentence BLEU of a token sequence against a single reference, without numba.
+
+    Same result as bleu_score and nltk's sentence_bleu with method4 smoothing,
+    using memoized Counter n-gram counts.
+
+    Args:
+        candidate (tuple): Candidate tokens.
+        reference (tuple): Reference tokens.
+        weights (tuple): Weights for the 1..N-gram precisions.
+        k (int): The method4 smoothing constant.
+
+    Returns:
+        float: The BLEU score.
+    """
+    max_n = len(weights)
+    cand_counts = ngram_counts(tuple(candidate), max_n)
+    ref_counts = ngram_counts(tuple(reference), max_n)
+
+    numerators = []
+    denominators = []
+    for cand, ref in zip(cand_counts, ref_counts):
+        numerators.append(sum(min(count, ref[ngram]) for ngram, count in cand.items()))
+        denominators.append(max(1, sum(cand.values())))
+    return _bleu_from_counts(numerators, denominators, len(candidate), len(reference), weights, k)
+
+
+def batch_bleu(candidate, references, weights=(0.25, 0.25, 0.25, 0.25), k=5):
+    """
+    Sentence BLEU of one candidate against each of several references.
+
+    Each reference is scored on its own, exactly as counter_bleu would, but
+    the clipping, precisions and brevity penalty are computed for all
+    references in a handful of NumPy operations. Only the candidate's
+    n-grams can contribute matches, so they form the shared vocabulary.
+
+    Args:
+        candidate (tuple): Candidate tokens.
+        references (list): Reference token tuples.
+        weights (tuple): Weights for the 1..N-gram precisions.
+        k (int): The method4 smoothing constant.
+
+    Returns:
+        numpy.ndarray: The BLEU score against each reference.
+    """
+    max_n = len(weights)
+    cand_counts = ngram_counts(tuple(candidate), max_n)
+    ref_counts = [ngram_counts(tuple(reference), max_n) for reference in references]
+
+    # Candidate n-gram vocabulary, its counts and the order each entry belongs to
+    vocab = [(n, ngram) for n, counts in enumerate(cand_counts) for ngram in counts]
+    cand_vec = np.array([cand_counts[n][ngram] for n, ngram in vocab], dtype=np.int64)
+    orders = np.array([n for n, _ in vocab], dtype=np.int64)
+
+    # (references x vocab) counts, clipped by the candidate counts
+    ref_matrix = np.array(
+        [[counts[n][ngram] for n, ngram in vocab] for counts in ref_counts],
+        dtype=np.int64
+    ).reshape(len(references), len(vocab))
+    clipped = np.minimum(ref_matrix, cand_vec)
+
+    # Group-sum the clipped counts by n-gram order
+    numerators = np.zeros((len(references), max_n))
+    np.add.at(numerators.T, orders, clipped.T)
+    denominators = np.array([max(1, sum(counts.values())) for counts in cand_counts], dtype=np.float64)
+
+    hyp_len = len(candidate)
+    ref_lens = np.array([len(reference) for reference in references], dtype=np.float64)
+    with np.errstate(divide='ignore', invalid='ignore'):
+        brevity_penalty = np.where(hyp_len > ref_lens, 1.0, np.exp(1 - ref_lens / hyp_len))
+
+        # Smoothing method 4, with incvnt counting the zero-match orders seen so far
+        precisions = numerators / denominators
+        if hyp_len > 1:
+            zero = numerators == 0
+            incvnt = np.cumsum(zero, axis=1)
+            smoothed = 1 / (2.0 ** incvnt * k / math.log(hyp_len)) / denominators
+            precisions = np.where(zero, smoothed, precisions)
+
+        log_p = np.where(precisions > 0, np.log(precisions), 0.0)
+    scores = brevity_penalty * np.exp(log_p @ np.asarray(weights, dtype=np.float64))
+
+    # No unigram matches means a score of 0, as in nltk
+    return np.where(numerators[:, 0] == 0, 0.0, scores)
+
+
+def _bleu_from_counts(numerators, denominators, hyp_len, ref_len, weights, k):
+    """Combine clipped n-gram counts into BLEU with brevity penalty and method4 smoothing."""
+    if numerators[0] == 0:
+        return 0
+
+    if hyp_len > ref_len:
+        brevity_penalty = 1
+    else:
+        brevity_penalty = math.exp(1 - ref_len / hyp_len)
+
+    # Smoothing method 4: zero-match orders get counts shrinking with hypothesis length
+    precisions = []
+    incvnt = 1
+    for numerator, denominator in zip(numerators, denominators):
+        if numerator == 0 and hyp_len > 1:
+            precisions.append(1 / (2 ** incvnt * k / math.log(hyp_len)) / denominator)
+            incvnt += 1
+        else:
+            precisions.append(numerator / denominator)
+
+    log_sum = math.fsum(w * math.log(p) for w, p in zip(weights, precisions) if p > 0)
+    return brevity_penalty * math.exp(log_sum)
@@ -0,0 +1,198 @@
+import os
+import re
+import pickle
+import hashlib
+import logging
+import numpy as np
+
+from collections import Counter
+from scipy.sparse import csr_matrix
+from metrics.sentence_encoder import load_sentence_encoder
+
+_WORD_RE = re.compile(r'\w+')
+
+
+def _top_k(solutions, sims, top_k):
+    """Keep the top_k highest-scoring solutions, in their original order."""
+    top = np.argpartition(-sims, top_k - 1)[:top_k]
+    return [solutions[i] for i in sorted(top)]
+
+
+class CandidateFilter:
+    def __init__(
+            self,
+            top_k=5,
+            model_name="sentence-transformers/all-MiniLM-L6-v2",
+            cache_path=None
+    ):
+        """
+        Cheap first-pass retrieval that narrows the solutions sent to BERTScore.
+
+        Every solution gets one MiniLM sentence embedding; a response is only
+        scored in full against the top_k solutions closest to it by cosine.
+
+        Args:
+            top_k (int): Number of candidates kept for full scoring.
+            model_name (str): sentence-transformers model used for the first pass.
+            cache_path (str): Optional pickle file persisting solution embeddings,
+                keyed by the SHA-256 of each solution text.
+        """
+        self.top_k = top_k
+        self.model_name = model_name
+        self.cache_path = cache_path
+        self._rows = {}
+        self._embeddings = None
+
+    def fit(self, solutions, solution_texts, batch_size=64):
+        """
+        Embed the solutions that candidates will be drawn from.
+
+        Args:
+            solutions (list): Solution objects, used for their ids.
+            solution_texts (list): The text of each solution, in the same order.
+            batch_size (int): Number of texts per encoder forward pass.
+        """
+        cached = self._load_cache()
+        keys = [hashlib.sha256(text.encode('utf-8')).hexdigest() for text in solution_texts]
+
+        missing = [(key, text) for key, text in zip(keys, solution_texts) if key not in cached]
+        if missing:
+            model = load_sentence_encoder(self.model_name)
+            embeddings = model.encode(
+                [text for _, text in missing],
+                batch_size=batch_size,
+                normalize_embeddings=True
+            ).astype(np.float32)
+            cached.update((key, embedding) for (key, _), embedding in zip(missing, embeddings))
+            self._save_cache(cached)
+
+        self._embeddings = np.vstack([cached[key] for key in keys]) if keys else None
+        self._rows = {solution.id: row for row, solution in enumerate(solutions)}
+        logging.info(
+            f"Candidate filter ready for {len(solutions)} solutions "
+            f"({len(solutions) - len(missing)} loaded from cache)"
+        )
+
+    def select(self, response_text, solutions):
+        """
+        Keep the top_k solutions most similar to a response.
+
+        Solutions keep their original relative order, so ties in the full
+        scoring pass are broken the same way as without the filter.
+
+        Returns:
+            list: The selected solutions, or all of them if there are no more
+                than top_k or some were never passed to fit().
+        """
+        if len(solutions) <= self.top_k or self._embeddings is None:
+            return solutions
+        if any(solution.id not in self._rows for solution in solutions):
+            return solutions
+
+        model = load_sentence_encoder(self.model_name)
+        query = model.encode(response_text, normalize_embeddings=True).astype(np.float32)
+
+        rows = [self._rows[solution.id] for solution in solutions]
+        # Embeddings are L2-normalised, so the dot product is the cosine similarity
+        sims = self._embeddings[rows] @ query
+        return _top_k(solutions, sims, self.top_k)
+
+    def _load_cache(self):
+        if not self.cache_path or not os.path.exists(self.cache_path):
+            return {}
+        try:
+            with open(self.cache_path, 'rb') as f:
+                data = pickle.load(f)
+        except Exception as e:
+            logging.warning(f"Could not read candidate filter cache {self.cache_path}: {e}")
+            return {}
+
+        # Embeddings from a different model are not comparable
+        if data.get('model_name') != self.model_name:
+            return {}
+        return data.get('embeddings', {})
+
+    def _save_cache(self, embeddings):
+        if not self.cache_path:
+            return
+        os.makedirs(os.path.dirname(self.cache_path) or ".", exist_ok=True)
+        with open(self.cache_path, 'wb') as f:
+            pickle.dump({'model_name': self.model_name, 'embeddings': embeddings}, f)
+
+
+class BM25CandidateFilter:
+    def __init__(self, top_k=5, k1=1.5, b=0.75):
+        """
+        Lexical first-pass retrieval with Okapi BM25; needs no model.
+
+        Same interface as CandidateFilter. Solution term weights are built
+        once in fit(), so scoring a response is one sparse matrix-vector product.
+
+        Args:
+            top_k (int): Number of candidates kept for full scoring.
+            k1 (float): BM25 term frequency saturation.
+            b (float): BM25 document length normalisation.
+        """
+        self.top_k = top_k
+        self.k1 = k1
+        self.b = b
+        self._rows = {}
+        self._vocab = {}
+        self._weights = None
+
+    def fit(self, solutions, solution_texts):
+        """
+        Index the solutions that candidates will be drawn from.
+
+        Args:
+            solutions (list): Solution objects, used for their ids.
+            solution_texts (list): The text of each solution, in the same order.
+        """
+        term_counts = [Counter(_WORD_RE.findall(text.lower())) for text in solution_texts]
+        doc_lens = np.array([sum(counts.values()) for counts in term_counts], dtype=np.float64)
+        avg_len = doc_lens.mean() if len(doc_lens) and doc_lens.mean() > 0 else 1.0
+
+        self._vocab = {}
+        rows, cols, tfs = [], [], []
+        for row, counts in enumerate(term_counts):
+            for term, tf in counts.items():
+                rows.append(row)
+                cols.append(self._vocab.setdefault(term, len(self._vocab)))
+                tfs.append(tf)
+        rows = np.array(rows, dtype=np.int64)
+        cols = np.array(cols, dtype=np.int64)
+        tfs = np.array(tfs, dtype=np.float64)
+
+        # Okapi IDF and saturated term frequency, folded into one weight per (solution, term)
+        n_docs = len(solution_texts)
+        doc_freq = np.bincount(cols, minlength=len(self._vocab))
+        idf = np.log((n_docs - doc_freq + 0.5) / (doc_freq + 0.5) + 1)
+        norm = self.k1 * (1 - self.b + self.b * doc_lens[rows] / avg_len)
+        weights = idf[cols] * tfs * (self.k1 + 1) / (tfs + norm)
+
+        self._weights = csr_matrix((weights, (rows, cols)), shape=(n_docs, len(self._vocab)))
+        self._rows = {solution.id: row for row, solution in enumerate(solutions)}
+        logging.info(f"BM25 candidate filter ready for {n_docs} solutions")
+
+    def select(self, response_text, solutions):
+        """
+        Keep the top_k solutions scoring highest for a response under BM25.
+
+        Returns:
+            list: The selected solutions, or all of them if there are no more
+                than top_k or some were never passed to fit().
+        """
+        if len(solutions) <= self.top_k or self._weights is None:
+            return solutions
+        if any(solution.id not in self._rows for solution in solutions):
+            return solutions
+
+        query = np.zeros(len(self._vocab))
+        for term, count in Counter(_WORD_RE.findall(response_text.lower())).items():
+            col = self._vocab.get(term)
+            if col is not None:
+                query[col] = count
+
+        rows = [self._rows[solution.id] for solution in solutions]
+        sims = self._weights[rows] @ query
+        return _top_k(solutions, sims, self.top_k)
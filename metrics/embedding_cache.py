@@ -0,0 +1,72 @@
+import os
+import torch
+import hashlib
+import logging
+
+
+class EmbeddingCache:
+    def __init__(self, cache_dir):
+        """
+        Cache BERT token embeddings of reference texts, in memory and on disk.
+
+        Entries are keyed by the SHA-256 of the text, so they stay valid across
+        runs as long as the text (and the model owning cache_dir) is unchanged.
+        Embeddings are stored in the dtype the model produced them in, so a
+        float16 CUDA model halves disk usage while a float32 model loses nothing.
+
+        Args:
+            cache_dir (str): Directory holding one .pt file per cached text.
+        """
+        self.cache_dir = cache_dir
+        os.makedirs(cache_dir, exist_ok=True)
+        self._memory = {}
+
+    @staticmethod
+    def key(text):
+        """Return the cache key for a text."""
+        return hashlib.sha256(text.encode('utf-8')).hexdigest()
+
+    def get(self, text):
+        """
+        Look up the cached embedding of a text.
+
+        Returns:
+            tuple: (embedding, idf) CPU tensors, or None on a miss.
+        """
+        key = self.key(text)
+        if key in self._memory:
+            return self._memory[key]
+
+        path = self._path(key)
+        if not os.path.exists(path):
+            return None
+
+        try:
+            data = torch.load(path, map_location="cpu")
+        except Exception as e:
+            logging.warning(f"Could not read cached embedding {path}: {e}")
+            return None
+
+        stats = (data['embedding'].float(), data['idf'])
+        self._memory[key] = stats
+        return stats
+
+    def put(self, text, embedding, idf):
+        """
+        Store the embedding of a text.
+
+        Returns:
+            tuple: The (embedding, idf) as they will be returned by get().
+        """
+        key = self.key(text)
+        embedding = embedding.cpu()
+        idf = idf.cpu()
+        torch.save({'embedding': embedding, 'idf': idf}, self._path(key))
+
+        # Keep the in-memory copy identical to what a later run loads from disk
+        stats = (embedding.float(), idf)
+        self._memory[key] = stats
+        return stats
+
+    def _path(self, key):
+        return os.path.join(self.cache_dir, f"{key}.pt")
@@ -1,30 +1,142 @@
+import os
 import re
 import nltk
+import string
 import torch
 import logging
+import numpy as np
 
 nltk.download('punkt_tab', quiet=True)
 
+from typing import Tuple
+from functools import lru_cache
+from dataclasses import dataclass
+from concurrent.futures import ThreadPoolExecutor
+from collections import defaultdict, OrderedDict
 from bert_score import BERTScorer
+from bert_score.utils import get_bert_embedding, greedy_cos_idf
+from torch.nn.utils.rnn import pad_sequence
+from scipy.sparse import csr_matrix
 from nltk.tokenize import word_tokenize
-from nltk.translate.bleu_score import sentence_bleu, SmoothingFunction
+
+from metrics.embedding_cache import EmbeddingCache
+from metrics.bleu_numba import NUMBA_MIN_TOKENS, _NUMBA_AVAILABLE, batch_bleu, bleu_score, can_encode, counter_bleu
+
+# Key technical terms in WhatsApp API domain
+DOMAIN_TERMS = [
+    "uninstall", "install", "restart", "vm", "virtual machine", 
+    "whatsapp api", "qr code", "scan", "delete", "session folder",
+    "add or remove", "fileserver", "package", "button", "schedule-send",
+    "label", "log in", "contact"
+]
+# One alternation scans for every term in a single pass; longest first so a
+# longer term wins over any shorter one starting at the same position
+_DOMAIN_RE = re.compile(
+    r'\b(' + '|'.join(map(re.escape, sorted(DOMAIN_TERMS, key=len, reverse=True))) + r')\b'
+)
+
+# Patterns used on every scored pair
+_CJK_RE = re.compile(r'[\u4e00-\u9fff]')
+_STEP_RE = re.compile(r'(?:\d+\.\s*|\*\s*|-)(.+?)(?=\n\d+\.|\n\*|\n-|\Z)')
+_WHITESPACE_RE = re.compile(r'\s+')
+_MARKDOWN_RE = re.compile(r'[\*_]{1,2}(.*?)[\*_]{1,2}')
+_LIST_MARKER_RE = re.compile(r'^[\d\.\-\*]+\s+', re.MULTILINE)
+_PUNCT_TABLE = str.maketrans({c: ' ' for c in string.punctuation})
+
+
+@lru_cache(maxsize=4096)
+def _is_cjk(text):
+    """Whether a text contains CJK ideographs and needs character-level BLEU tokens."""
+    return _CJK_RE.search(text) is not None
+
+
+@lru_cache(maxsize=4096)
+def _domain_terms(text):
+    """Domain terms present in a text, memoized since solution texts are static."""
+    return frozenset(match.group(1) for match in _DOMAIN_RE.finditer(text.lower()))
+
+
+@lru_cache(maxsize=4096)
+def _tokenize(text):
+    """Lowercased word tokens of a text, memoized since the same texts are scored repeatedly."""
+    return tuple(word_tokenize(text.lower()))
+
+
+@lru_cache(maxsize=4096)
+def _fast_tokenize(text):
+    """Lowercased tokens split on whitespace and ASCII punctuation, without NLTK."""
+    return tuple(text.translate(_PUNCT_TABLE).lower().split())
+
+@lru_cache(maxsize=None)
+def _load_bert_scorer(device, use_fp16=True):
+    """
+    Load the BERTScore model once per device and precision.
+
+    Every ScoreCalculator created in the process shares the returned scorer,
+    so the weights are loaded into memory only once.
+    """
+    # Layer 9 is bert_score's tuned default for bert-base-uncased; no baseline rescaling
+    scorer = BERTScorer(
+        model_type="bert-base-uncased",
+        num_layers=9,
+        device=device,
+    )
+    scorer._model.eval()
+
+    # Scoring never backpropagates, so drop autograd bookkeeping on the weights
+    for param in scorer._model.parameters():
+        param.requires_grad_(False)
+
+    # Scoring is forward-only, so half precision is safe and much faster on GPU
+    if use_fp16 and device.startswith("cuda"):
+        scorer._model.half()
+
+    # Let any remaining fp32 matmuls (e.g. with use_fp16=False) use TF32 tensor cores
+    if device.startswith("cuda"):
+        torch.backends.cuda.matmul.allow_tf32 = True
+        torch.backends.cudnn.allow_tf32 = True
+    return scorer
 
 
 class ScoreCalculator:
     def __init__(
             self,
-            device=None
+            device=None,
+            embedding_cache_dir=None,
+            use_fp16=True,
+            fast_tokenize=False
     ):
         self.device = device or ("cuda" if torch.cuda.is_available() else "cpu")
-        self.bert_scorer = BERTScorer(
-            model_type="bert-base-uncased",
-            device=self.device,
-        )
+        self.bert_scorer = _load_bert_scorer(self.device, use_fp16)
+
+        # Uniform IDF weights with [CLS]/[SEP] ignored, as BERTScorer does when idf=False
+        tokenizer = self.bert_scorer._tokenizer
+        self._idf_dict = defaultdict(lambda: 1.0)
+        self._idf_dict[tokenizer.sep_token_id] = 0
+        self._idf_dict[tokenizer.cls_token_id] = 0
+
+        self._embedding_cache_dir = embedding_cache_dir
+        self.embedding_cache = self._open_embedding_cache()
+
+        # NLTK's Punkt tokenizer by default; the translate/split path is much faster
+        # but drops punctuation tokens, so F1 and BLEU scores shift slightly
+        self._tokenize = _fast_tokenize if fast_tokenize else _tokenize
+
+        # Token ids shared by all BLEU calls on the numba path
+        self._bleu_vocab = {}
+
+        # Recently scored responses, so re-scoring the same text skips the BERT pass
+        self._candidate_cache = OrderedDict()
+        self._candidate_cache_size = 128
 
     def calculate_all_metrics(
             self, 
             response_text, 
-            solution_text
+            solution_text,
+            bert_scores=None,
+            trad_f1=None,
+            bleu=None,
+            steps_bleu=None
     ):
         """
         Calculate all metrics for the given model response and solution text.
@@ -32,6 +144,13 @@ class ScoreCalculator:
         Args:
             model_response (str): The model's response.
             solution_text (str): The reference solution text.
+            bert_scores (tuple, optional): Precomputed (precision, recall, F1) BERTScore
+                for this pair, e.g. from calculate_bert_scores_batch.
+            trad_f1 (float, optional): Precomputed traditional F1 for this pair,
+                e.g. from calculate_traditional_f1_batch.
+            bleu (float, optional): Precomputed BLEU for this pair, e.g. from
+                calculate_bleu_scores_batch.
+            steps_bleu (float, optional): Precomputed BLEU of the extracted steps.
         
         Returns:
             dict: A dictionary containing all calculated metrics.
@@ -39,23 +158,55 @@ class ScoreCalculator:
         metrics = {}
         
         # BERTScore
-        metrics['bert_precision'], metrics['bert_recall'], metrics['bert_f1'] = self.calculate_bert_score(response_text, solution_text)
+        if bert_scores is None:
+            bert_scores = self.calculate_bert_score(response_text, solution_text)
+        metrics['bert_precision'], metrics['bert_recall'], metrics['bert_f1'] = bert_scores
         
         # Traditional F1
-        metrics['trad_f1'] = self.calculate_traditional_f1(response_text, solution_text)
+        if trad_f1 is None:
+            trad_f1 = self.calculate_traditional_f1(response_text, solution_text)
+        metrics['trad_f1'] = trad_f1
         
         # BLEU
-        metrics['bleu'] = self.calculate_bleu_score(response_text, solution_text)
+        if bleu is None:
+            bleu = self.calculate_bleu_score(response_text, solution_text)
+        metrics['bleu'] = bleu
 
         # Calculate steps-specific BLEU (focusing only on procedural content)
-        response_steps = self._format_response_for_scoring(response_text)
-        solution_steps = self._format_response_for_scoring(solution_text)
-        metrics['steps_bleu'] = self.calculate_bleu_score(response_steps, solution_steps)
+        if steps_bleu is None:
+            response_steps = self._format_response_for_scoring(response_text)
+            solution_steps = self._format_response_for_scoring(solution_text)
+            steps_bleu = self.calculate_bleu_score(response_steps, solution_steps)
+        metrics['steps_bleu'] = steps_bleu
         
         # Custom combined score (weighted average favoring semantic similarity)
         metrics['combined_score'] = 0.6 * metrics['bert_f1'] + 0.3 * metrics['trad_f1'] + 0.1 * metrics['steps_bleu']
         
         return metrics
+
+    def score_pair(self, response_text, solution_text, reference_embedding=None):
+        """
+        Calculate all metrics for a single response/solution pair.
+        
+        Args:
+            response_text (str): The model's response.
+            solution_text (str): The reference solution text.
+            reference_embedding (tuple, optional): Precomputed (embedding, idf) of the
+                solution, e.g. from encode_references.
+        
+        Returns:
+            dict: A dictionary containing all calculated metrics.
+        """
+        P, R, F1 = self.calculate_bert_scores_batch(
+            [response_text],
+            [solution_text],
+            reference_embeddings=[reference_embedding] if reference_embedding is not None else None
+        )
+        return self.calculate_all_metrics(
+            response_text,
+            solution_text,
+            bert_scores=(float(P[0]), float(R[0]), float(F1[0]))
+        )
     
 
     
@@ -70,8 +221,171 @@ class ScoreCalculator:
         Returns:
             tuple: A tuple containing precision, recall, and F1 scores.
         """
-        P, R, F1 = self.bert_scorer.score([response_text], [solution_text])
-        return P.item(), R.item(), F1.item()
+        P, R, F1 = self.calculate_bert_scores_batch([response_text], [solution_text])
+        return float(P[0]), float(R[0]), float(F1[0])
+
+    def calculate_bert_scores_batch(self, response_texts, solution_texts, batch_size=32, reference_embeddings=None):
+        """
+        Calculate BERTScore for many (response, solution) pairs in one call.
+        
+        Each distinct text is embedded once; solution embeddings are served
+        from the embedding cache when one is configured.
+        
+        Args:
+            response_texts (list): The model responses (candidates).
+            solution_texts (list): The reference solution texts, one per response.
+            batch_size (int): Number of pairs per BERT forward pass.
+            reference_embeddings (list, optional): Precomputed (embedding, idf) pairs
+                for solution_texts, as returned by encode_references.
+        
+        Returns:
+            tuple: NumPy arrays of precision, recall and F1 scores.
+        """
+        def score(batch_size):
+            with torch.inference_mode():
+                cand_stats = self._candidate_stats(response_texts, batch_size)
+                ref_stats = reference_embeddings or self._reference_stats(solution_texts, batch_size)
+
+                # Batch pairs of similar reference length to keep padding small
+                order = sorted(range(len(ref_stats)), key=lambda i: ref_stats[i][0].size(0))
+                scores = []
+                for start in range(0, len(order), batch_size):
+                    rows = order[start:start + batch_size]
+                    P, R, F1 = greedy_cos_idf(
+                        *self._pad_stats([ref_stats[i] for i in rows]),
+                        *self._pad_stats([cand_stats[i] for i in rows])
+                    )
+                    scores.append(torch.stack((P, R, F1), dim=-1).float().cpu())
+
+            # Put the scores back in input order
+            scores = torch.cat(scores)[torch.tensor(order).argsort()]
+            return scores[:, 0].numpy(), scores[:, 1].numpy(), scores[:, 2].numpy()
+
+        return self._run_with_oom_fallback(score, batch_size)
+
+    def encode_references(self, solution_texts, batch_size=32):
+        """
+        Embed reference solution texts in batched BERT forward passes.
+        
+        Args:
+            solution_texts (list): The reference solution texts.
+            batch_size (int): Number of texts per BERT forward pass.
+        
+        Returns:
+            list: (embedding, idf) CPU tensors per text, for calculate_bert_scores_batch.
+        """
+        def encode(batch_size):
+            with torch.inference_mode():
+                return self._reference_stats(solution_texts, batch_size)
+
+        return self._run_with_oom_fallback(encode, batch_size)
+
+    def _open_embedding_cache(self):
+        """Return the embedding cache for the current scorer, or None if caching is off."""
+        if not self._embedding_cache_dir:
+            return None
+
+        # Reference embeddings are only valid for the model, and precision, that produced them
+        dtype = str(next(self.bert_scorer._model.parameters()).dtype).replace("torch.", "")
+        model_dir = f"{self.bert_scorer.model_type}_L{self.bert_scorer.num_layers}_{dtype}"
+        return EmbeddingCache(os.path.join(self._embedding_cache_dir, model_dir))
+
+    def _run_with_oom_fallback(self, fn, batch_size):
+        """
+        Call fn(batch_size), recovering from CUDA out-of-memory errors.
+        
+        The batch size is halved on each failure; once it reaches 1 this
+        calculator switches to a CPU scorer.
+        """
+        while True:
+            try:
+                return fn(batch_size)
+            except torch.cuda.OutOfMemoryError:
+                torch.cuda.empty_cache()
+                if batch_size > 1:
+                    batch_size //= 2
+                    logging.warning(f"CUDA out of memory in BERTScore, retrying with batch_size={batch_size}")
+                elif self.device != "cpu":
+                    logging.warning("CUDA out of memory in BERTScore, falling back to CPU")
+                    # The CUDA scorer is shared with other calculators, so switch
+                    # this one to its own fp32 CPU scorer instead of moving it
+                    self.device = "cpu"
+                    self.bert_scorer = _load_bert_scorer("cpu", use_fp16=False)
+                    self.embedding_cache = self._open_embedding_cache()
+                    self._candidate_cache.clear()
+                else:
+                    raise
+
+    def _encode(self, texts, batch_size=32):
+        """
+        Embed texts with the BERTScore model, encoding each distinct text once.
+        
+        Returns:
+            list: (embedding, idf) CPU tensors per text, trimmed to its token length.
+        """
+        # Longest first, as bert_score does, so each batch holds similar lengths
+        unique_texts = sorted(dict.fromkeys(texts), key=lambda text: len(text.split()), reverse=True)
+        stats = {}
+        for start in range(0, len(unique_texts), batch_size):
+            batch = unique_texts[start:start + batch_size]
+            embs, masks, padded_idf = get_bert_embedding(
+                batch,
+                self.bert_scorer._model,
+                self.bert_scorer._tokenizer,
+                self._idf_dict,
+                device=self.device
+            )
+            embs, masks, padded_idf = embs.cpu(), masks.cpu(), padded_idf.cpu()
+            for i, text in enumerate(batch):
+                seq_len = int(masks[i].sum().item())
+                stats[text] = (embs[i, :seq_len], padded_idf[i, :seq_len])
+        return [stats[text] for text in texts]
+
+    def _candidate_stats(self, texts, batch_size=32):
+        """Embed candidate texts, reusing recently embedded ones."""
+        cache = self._candidate_cache
+        stats = {}
+        for text in dict.fromkeys(texts):
+            if text in cache:
+                cache.move_to_end(text)
+                stats[text] = cache[text]
+
+        missing = [text for text in dict.fromkeys(texts) if text not in stats]
+        if missing:
+            for text, stat in zip(missing, self._encode(missing, batch_size)):
+                stats[text] = cache[text] = stat
+            while len(cache) > self._candidate_cache_size:
+                cache.popitem(last=False)
+
+        return [stats[text] for text in texts]
+
+    def _reference_stats(self, texts, batch_size=32):
+        """Embed reference texts, reusing and filling the embedding cache."""
+        if self.embedding_cache is None:
+            return self._encode(texts, batch_size)
+
+        stats = [self.embedding_cache.get(text) for text in texts]
+        missing = [text for text, stat in zip(texts, stats) if stat is None]
+        if missing:
+            computed = {
+                text: self.embedding_cache.put(text, *stat)
+                for text, stat in zip(missing, self._encode(missing, batch_size))
+            }
+            stats = [stat if stat is not None else computed[text] for text, stat in zip(texts, stats)]
+        return stats
+
+    def _pad_stats(self, stats):
+        """Pad (embedding, idf) pairs into the batch tensors expected by greedy_cos_idf."""
+        # Cached embeddings are float32; match the model's dtype so both sides can be multiplied
+        dtype = next(self.bert_scorer._model.parameters()).dtype
+        embs = [emb.to(self.device, dtype=dtype) for emb, _ in stats]
+        idfs = [idf.to(self.device) for _, idf in stats]
+        lens = torch.tensor([emb.size(0) for emb in embs])
+
+        emb_pad = pad_sequence(embs, batch_first=True, padding_value=2.0)
+        idf_pad = pad_sequence(idfs, batch_first=True)
+        mask = torch.arange(int(lens.max())).expand(len(lens), -1) < lens.unsqueeze(1)
+        return emb_pad, mask.to(self.device), idf_pad
     
 
     def calculate_traditional_f1(self, response_text, solution_text):
@@ -87,14 +401,16 @@ class ScoreCalculator:
     
         """
         # Tokenize texts
-        response_tokens = set(word_tokenize(response_text.lower()))
-        solution_tokens = set(word_tokenize(solution_text.lower()))
+        response_tokens = set(self._tokenize(response_text))
+        solution_tokens = set(self._tokenize(solution_text))
 
         # Extract key technical terms from solution
         key_terms = self._extract_technical_terms(solution_text)
 
-        # Check which key terms are found in response
-        found_terms = [term for term in key_terms if any(term.lower() in token.lower() for token in response_tokens)]
+        # Check which key terms are found in response; a term counts when it is
+        # inside any token, which a substring test on the NUL-joined tokens matches exactly
+        response_blob = "\0".join(response_tokens)
+        found_terms = {term for term in key_terms if term in response_blob}
     
         # Calculate weighted precision and recall
         term_weight = 2.0  # Weight key terms higher
@@ -114,6 +430,81 @@ class ScoreCalculator:
         
     
 
+    def build_token_matrix(self, solution_texts):
+        """
+        Build the token matrices used by calculate_traditional_f1_batch.
+        
+        Args:
+            solution_texts (list): The reference solution texts.
+        
+        Returns:
+            tuple: (token_matrix, key_term_matrix, vocab) where token_matrix is a
+                binary solution-by-token CSR matrix, key_term_matrix marks the
+                tokens that are key technical terms of each solution, and vocab
+                maps tokens to column indices.
+        """
+        vocab = {}
+        token_entries = ([], [])
+        key_entries = ([], [])
+
+        for row, solution_text in enumerate(solution_texts):
+            solution_tokens = set(self._tokenize(solution_text))
+            key_terms = self._extract_technical_terms(solution_text)
+            for token in solution_tokens:
+                col = vocab.setdefault(token, len(vocab))
+                token_entries[0].append(row)
+                token_entries[1].append(col)
+                if token in key_terms:
+                    key_entries[0].append(row)
+                    key_entries[1].append(col)
+
+        shape = (len(solution_texts), len(vocab))
+        token_matrix = csr_matrix((np.ones(len(token_entries[0])), token_entries), shape=shape)
+        key_term_matrix = csr_matrix((np.ones(len(key_entries[0])), key_entries), shape=shape)
+        return token_matrix, key_term_matrix, vocab
+
+    def calculate_traditional_f1_batch(self, response_text, token_matrices):
+        """
+        Calculate traditional F1 of one response against many solutions at once.
+        
+        Equivalent to calling calculate_traditional_f1 per solution, but the
+        token overlaps are computed with sparse matrix-vector products.
+        
+        Args:
+            response_text (str): The model's response.
+            token_matrices (tuple): The result of build_token_matrix for the solutions.
+        
+        Returns:
+            numpy.ndarray: The F1 score per solution.
+        """
+        token_matrix, key_term_matrix, vocab = token_matrices
+        response_tokens = set(self._tokenize(response_text))
+        if not response_tokens:
+            return np.zeros(token_matrix.shape[0])
+
+        in_response = np.zeros(len(vocab))
+        in_response[[vocab[token] for token in response_tokens if token in vocab]] = 1.0
+
+        # Key terms count as found when they appear inside any response token
+        found = np.zeros(len(vocab))
+        response_blob = "\0".join(response_tokens)
+        for term in DOMAIN_TERMS:
+            if term in vocab and term in response_blob:
+                found[vocab[term]] = 1.0
+
+        overlap = token_matrix @ in_response
+        solution_sizes = np.asarray(token_matrix.sum(axis=1)).ravel()
+
+        # Found key terms weigh double as true positives, missed ones double as false negatives
+        weighted_tp = overlap + key_term_matrix @ (in_response * found)
+        weighted_fn = (solution_sizes - overlap) + key_term_matrix @ ((1.0 - in_response) * (1.0 - found))
+
+        precision = weighted_tp / len(response_tokens)
+        recall = np.divide(weighted_tp, weighted_tp + weighted_fn,
+                           out=np.zeros_like(weighted_tp), where=(weighted_tp + weighted_fn) > 0)
+        return np.divide(2 * precision * recall, precision + recall,
+                         out=np.zeros_like(precision), where=(precision + recall) > 0)
+
     def calculate_bleu_score(self, response_text, solution_text):
         """
         Calculate BLEU score between response and solution.
@@ -125,55 +516,78 @@ class ScoreCalculator:
         Returns:
             float: The BLEU score.
         """ 
-        # Download required nltk resources if not already done
-        nltk.download('punkt_tab', quiet=True)
         try:
             # Extract just the steps from model response to better match the solution
             response_clean = self._format_response_for_scoring(response_text)
 
-
-            # For Chinese text, use character-level tokenization
-            if any(u'\u4e00' <= c <= u'\u9fff' for c in response_text):
-                response_tokens = list(response_clean)
-                solution_tokens = list(solution_text)
+            # One tokenization per text: characters for Chinese, words otherwise
+            if _is_cjk(response_text):
+                response_tokens = tuple(response_clean)
+                solution_tokens = tuple(solution_text)
             else:
-                # For other languages, use simple word-level tokenization
-                response_tokens = word_tokenize(response_clean.lower())
-                solution_tokens = word_tokenize(solution_text.lower())
-            
-            # Define reference and candidate
-            reference = [solution_tokens]  # BLEU expects a list of references
-            candidate = response_tokens
+                response_tokens = self._tokenize(response_clean)
+                solution_tokens = self._tokenize(solution_text)
             
             # Define weights for n-grams (1-gram and 2-gram focus)
             weights = (0.4, 0.3, 0.2, 0.1)
-            
-            smoothing = SmoothingFunction().method4
 
-            # Calculate BLEU score
-            score = sentence_bleu(reference, candidate, weights=weights, smoothing_function=smoothing)
-            return score
+            # Compiled n-gram counting for long texts; both paths match nltk's sentence_bleu with method4 smoothing
+            long_enough = max(len(response_tokens), len(solution_tokens)) >= NUMBA_MIN_TOKENS
+            vocab_bound = len(self._bleu_vocab) + len(response_tokens) + len(solution_tokens)
+            if _NUMBA_AVAILABLE and long_enough and can_encode(vocab_bound, len(weights)):
+                cand_ids = self._encode_bleu_tokens(response_tokens)
+                ref_ids = self._encode_bleu_tokens(solution_tokens)
+                return bleu_score(cand_ids, ref_ids, weights=weights, base=len(self._bleu_vocab) + 1)
+
+            return counter_bleu(response_tokens, solution_tokens, weights=weights)
         except Exception as e:
             logging.warning(f"Error calculating BLEU score: {e}")
             return 0
         
+    def calculate_bleu_scores_batch(self, response_text, solution_texts, solution_tokens=None):
+        """
+        Calculate BLEU of one response against many solutions at once.
+        
+        Gives the same scores as calling calculate_bleu_score for each solution.
+        
+        Args:
+            response_text (str): The model's response.
+            solution_texts (list): The reference solution texts.
+            solution_tokens (list, optional): Precomputed word tokens of each
+                solution text, used unless the response needs character tokens.
+        
+        Returns:
+            numpy.ndarray: The BLEU score against each solution.
+        """
+        try:
+            response_clean = self._format_response_for_scoring(response_text)
+
+            # Same tokenization rules as calculate_bleu_score
+            if _is_cjk(response_text):
+                response_tokens = tuple(response_clean)
+                solution_tokens = [tuple(text) for text in solution_texts]
+            else:
+                response_tokens = self._tokenize(response_clean)
+                if solution_tokens is None:
+                    solution_tokens = [self._tokenize(text) for text in solution_texts]
+
+            return batch_bleu(response_tokens, solution_tokens, weights=(0.4, 0.3, 0.2, 0.1))
+        except Exception as e:
+            logging.warning(f"Error calculating batched BLEU scores: {e}")
+            return np.array([self.calculate_bleu_score(response_text, text) for text in solution_texts])
+
+    def _encode_bleu_tokens(self, tokens):
+        """Map tokens to int64 ids in the shared BLEU vocabulary."""
+        vocab = self._bleu_vocab
+        return np.fromiter(
+            (vocab.setdefault(token, len(vocab)) for token in tokens),
+            dtype=np.int64,
+            count=len(tokens)
+        )
+
     def _extract_technical_terms(self, text):
         """Extract technical terms that should be weighted more heavily in matching"""
-        # Key technical terms in WhatsApp API domain
-        domain_terms = [
-            "uninstall", "install", "restart", "vm", "virtual machine", 
-            "whatsapp api", "qr code", "scan", "delete", "session folder",
-            "add or remove", "fileserver", "package", "button", "schedule-send",
-            "label", "log in", "contact"
-        ]
-        
-        # Find all instances of these terms in the text
-        found_terms = []
-        for term in domain_terms:
-            if re.search(r'\b' + re.escape(term) + r'\b', text.lower()):
-                found_terms.append(term)
-                
-        return found_terms
+        return _domain_terms(text)
         
     def _format_response_for_scoring(self, response_text):
         """
@@ -185,31 +599,129 @@ class ScoreCalculator:
             str: The formatted response text.
         """
         # Use regex to identify the numbered steps and bullets
-        steps = re.findall(r'(?:\d+\.\s*|\*\s*|-)(.+?)(?=\n\d+\.|\n\*|\n-|\Z)', response_text)
+        steps = _STEP_RE.findall(response_text)
 
         if steps:
             return "\n".join(steps).strip()
         return response_text
     
 
+@dataclass(frozen=True, slots=True)
+class SolutionFeatures:
+    """Per-solution inputs to the lexical metrics, derived once per run."""
+    text: str
+    tokens: Tuple[str, ...]
+    steps_text: str
+    steps_tokens: Tuple[str, ...]
+
+
 class SolutionMatcher:
-    def __init__(self, score_calculator):
+    def __init__(self, score_calculator, candidate_filter=None):
         self.score_calculator = score_calculator
+        self.candidate_filter = candidate_filter
+        self._reference_embeddings = {}
+        self._token_matrices = None
+        self._token_rows = {}
+        self._features = {}
+        self._bert_executor = ThreadPoolExecutor(max_workers=1)
+
+    def precompute_reference_embeddings(self, solutions, batch_size=32):
+        """
+        Embed all solutions up front so each question only encodes its response.
+        
+        Args:
+            solutions (list): Solution objects that will be matched against.
+            batch_size (int): Number of solutions per BERT forward pass.
+        """
+        solution_texts = [self._solution_text(solution) for solution in solutions]
+        embeddings = self.score_calculator.encode_references(solution_texts, batch_size=batch_size)
+        self._reference_embeddings = {
+            solution.id: embedding for solution, embedding in zip(solutions, embeddings)
+        }
+
+        # One token matrix over every solution; each question slices out its candidates
+        self._token_matrices = self.score_calculator.build_token_matrix(solution_texts)
+        self._token_rows = {solution.id: row for row, solution in enumerate(solutions)}
+        logging.info(f"Precomputed reference embeddings for {len(solutions)} solutions")
+
+        if self.candidate_filter is not None:
+            self.candidate_filter.fit(solutions, solution_texts)
     
+    def close(self):
+        """Shut down the background BERT scoring thread."""
+        self._bert_executor.shutdown(wait=True)
+
     def find_best_solution(self, response_text, solutions, metric_key='combined_score'):
         """Find best matching solution based on specified metric"""
         best_score = -1
         best_solution = None
         best_metrics = None
         
+        if not solutions:
+            return best_solution, best_metrics
+
         # Preprocess response to normalize formatting
         response_text = self._preprocess_text(response_text)
 
-        for solution in solutions:
-            solution_text = " ".join(solution.steps)
-            solution_text = self._preprocess_text(solution_text)
-            
-            metrics = self.score_calculator.calculate_all_metrics(response_text, solution_text)
+        # Narrow down to the closest candidates before the expensive BERT pass
+        if self.candidate_filter is not None:
+            solutions = self.candidate_filter.select(response_text, solutions)
+
+        # A single pinned solution is the best match by definition, so just score it
+        if len(solutions) == 1:
+            solution = solutions[0]
+            metrics = self.score_calculator.score_pair(
+                response_text,
+                self._solution_text(solution),
+                reference_embedding=self._reference_embeddings.get(solution.id)
+            )
+            return solution, metrics
+
+        features = [self._solution_features(solution) for solution in solutions]
+        solution_texts = [feature.text for feature in features]
+
+        # Only the response needs encoding when every solution was precomputed
+        reference_embeddings = [self._reference_embeddings.get(solution.id) for solution in solutions]
+        if any(embedding is None for embedding in reference_embeddings):
+            reference_embeddings = None
+
+        # Score every candidate in a single batched BERT pass, in the background:
+        # torch releases the GIL, so the lexical metrics below run alongside it
+        bert_future = self._bert_executor.submit(
+            self.score_calculator.calculate_bert_scores_batch,
+            [response_text] * len(solution_texts),
+            solution_texts,
+            reference_embeddings=reference_embeddings
+        )
+
+        trad_f1 = self.score_calculator.calculate_traditional_f1_batch(
+            response_text,
+            self._candidate_token_matrices(solutions, solution_texts)
+        )
+
+        # BLEU on the full texts and on just their extracted steps, one vectorized pass each
+        bleu = self.score_calculator.calculate_bleu_scores_batch(
+            response_text,
+            solution_texts,
+            solution_tokens=[feature.tokens for feature in features]
+        )
+        steps_bleu = self.score_calculator.calculate_bleu_scores_batch(
+            self.score_calculator._format_response_for_scoring(response_text),
+            [feature.steps_text for feature in features],
+            solution_tokens=[feature.steps_tokens for feature in features]
+        )
+
+        P, R, F1 = bert_future.result()
+
+        for idx, (solution, solution_text) in enumerate(zip(solutions, solution_texts)):
+            metrics = self.score_calculator.calculate_all_metrics(
+                response_text,
+                solution_text,
+                bert_scores=(float(P[idx]), float(R[idx]), float(F1[idx])),
+                trad_f1=float(trad_f1[idx]),
+                bleu=float(bleu[idx]),
+                steps_bleu=float(steps_bleu[idx])
+            )
             
             # Use combined_score by default for better matching
             if metrics[metric_key] > best_score:
@@ -219,12 +731,42 @@ class SolutionMatcher:
         
         return best_solution, best_metrics
 
+    def _candidate_token_matrices(self, solutions, solution_texts):
+        """Return the token matrices for a candidate set, sliced from the precomputed ones when possible."""
+        if self._token_matrices is None or any(solution.id not in self._token_rows for solution in solutions):
+            return self.score_calculator.build_token_matrix(solution_texts)
+
+        # Extra vocabulary columns from other solutions are zero in these rows,
+        # so the per-row F1 is the same as with a matrix built for the subset
+        token_matrix, key_term_matrix, vocab = self._token_matrices
+        rows = [self._token_rows[solution.id] for solution in solutions]
+        return token_matrix[rows], key_term_matrix[rows], vocab
+
+    def _solution_text(self, solution):
+        """Return the normalized text a solution is scored on."""
+        return self._solution_features(solution).text
+
+    def _solution_features(self, solution):
+        """Return the cached lexical features of a solution, computing them on first use."""
+        features = self._features.get(solution.id)
+        if features is None:
+            text = self._preprocess_text(solution.text)
+            steps_text = self.score_calculator._format_response_for_scoring(text)
+            features = SolutionFeatures(
+                text=text,
+                tokens=self.score_calculator._tokenize(text),
+                steps_text=steps_text,
+                steps_tokens=self.score_calculator._tokenize(steps_text)
+            )
+            self._features[solution.id] = features
+        return features
+
     def _preprocess_text(self, text):
         """Normalize text for better comparison"""
         # Remove extra whitespace and normalize line endings
-        text = re.sub(r'\s+', ' ', text)
+        text = _WHITESPACE_RE.sub(' ', text)
         # Remove markdown formatting (**, __, etc.)
-        text = re.sub(r'[\*_]{1,2}(.*?)[\*_]{1,2}', r'\1', text)
+        text = _MARKDOWN_RE.sub(r'\1', text)
         # Remove bullet points and numbering
-        text = re.sub(r'^[\d\.\-\*]+\s+', '', text, flags=re.MULTILINE)
+        text = _LIST_MARKER_RE.sub('', text)
         return text.strip()
\ No newline at end of file
@@ -0,0 +1,14 @@
+from functools import lru_cache
+
+
+@lru_cache(maxsize=None)
+def load_sentence_encoder(model_name):
+    """Load a sentence-transformers model once per process."""
+    try:
+        from sentence_transformers import SentenceTransformer
+    except ImportError as e:
+        raise ImportError(
+            "sentence-transformers is required for the semantic cache and candidate filter. "
+            "Install it with `pip install sentence-transformers`."
+        ) from e
+    return SentenceTransformer(model_name)
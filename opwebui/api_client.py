@@ -1,8 +1,13 @@
 import os
+import httpx
+import asyncio
 import logging
 import requests
+import importlib.util
 
 from dotenv import load_dotenv
+from urllib3.util.retry import Retry
+from requests.adapters import HTTPAdapter
 from opwebui.models.chat_response import ChatResponse
 
 load_dotenv()
@@ -14,8 +19,23 @@ COLLECTION_ID = os.getenv("COLLECTION_ID")
 if not API_URL or not API_KEY or not OP_MODEL:
     raise ValueError("API_URL, API_KEY, and OP_MODEL must be set in the environment variables.")
 
+# httpx only speaks HTTP/2 when the optional h2 package is installed
+HTTP2_AVAILABLE = importlib.util.find_spec("h2") is not None
+
+# Transient gateway and rate-limit responses are retried with exponential backoff
+RETRY_STATUSES = frozenset({429, 502, 503, 504})
+MAX_RETRIES = 3
+BACKOFF_FACTOR = 0.3
+
+def _retry_delay(response, attempt):
+    """Seconds to wait before retrying a response, honouring a numeric Retry-After."""
+    retry_after = response.headers.get("Retry-After", "")
+    if retry_after.isdigit():
+        return float(retry_after)
+    return BACKOFF_FACTOR * (2 ** attempt)
+
 class OpenWebUIClient:
-    def __init__(self, role: str = "user"):
+    def __init__(self, role: str = "user", max_connections: int = 8):
         self.api_url = API_URL
         self.jwt_token = API_KEY
         self.headers = {
@@ -24,6 +44,43 @@ class OpenWebUIClient:
         }
         self.model_name = OP_MODEL
         self.role = role
+        self.max_connections = max_connections
+        self._async_client = None
+
+        # One keep-alive session for all synchronous calls; transient gateway and
+        # rate-limit responses are retried with backoff
+        retry = Retry(
+            total=MAX_RETRIES,
+            backoff_factor=BACKOFF_FACTOR,
+            status_forcelist=RETRY_STATUSES,
+            allowed_methods=frozenset({"POST"})
+        )
+        adapter = HTTPAdapter(pool_connections=8, pool_maxsize=32, max_retries=retry)
+        self.session = requests.Session()
+        self.session.headers.update(self.headers)
+        self.session.mount("http://", adapter)
+        self.session.mount("https://", adapter)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
+
+    def close(self):
+        """Close the synchronous HTTP session."""
+        self.session.close()
+
+    def _build_payload(self, prompt: str):
+        """Build the chat completion request body for a prompt."""
+        return {
+            "model": self.model_name,
+            "stream": False,
+            "messages": [{"role": self.role, "content": prompt}],
+            "files": [
+                {"type": "collection", "id": COLLECTION_ID}
+            ]
+        }
 
     def chat_with_model(self, prompt: str):
         """
@@ -35,22 +92,16 @@ class OpenWebUIClient:
         Returns:
             str: The model's response.
         """
-        payload = {
-            "model": self.model_name,
-            "stream": False,
-            "messages": [{"role": self.role, "content": prompt}],
-            "files": [
-                {"type": "collection", "id": COLLECTION_ID}
-            ]
-        }
+        payload = self._build_payload(prompt)
         
         try:
-            response = requests.post(self.api_url, headers=self.headers, json=payload)
+            # Bounded connect, unbounded read: model inference time varies widely
+            response = self.session.post(self.api_url, json=payload, timeout=(5, None))
             response.raise_for_status()
-            raw_data = response.json()
+            chat_response = ChatResponse.from_json(response.content)
 
-            logging.debug(f"\nResponse From API {ChatResponse.from_dict(raw_data)}\n")
-            return ChatResponse.from_dict(raw_data)
+            logging.debug(f"\nResponse From API {chat_response}\n")
+            return chat_response
         
         except requests.exceptions.HTTPError as e:
             logging.error(f"HTTP error: {e}")
@@ -63,5 +114,68 @@ class OpenWebUIClient:
         except ValueError as e:
             logging.error(f"Error parsing JSON response: {e}")
         return None
-    
 
+    async def chat_with_model_async(self, prompt: str):
+        """
+        Send a chat message to the model without blocking the event loop.
+        
+        All calls share one httpx.AsyncClient so connections are reused, over
+        HTTP/2 when h2 is installed. Failed connects and the RETRY_STATUSES
+        responses are retried up to MAX_RETRIES times, like the synchronous call.
+        
+        Args:
+            prompt (str): The message to send to the model.
+        
+        Returns:
+            ChatResponse: The model's response, or None on failure.
+        """
+        if self._async_client is None:
+            # Bounded connect, unbounded read, matching the synchronous call
+            # Pool limits and HTTP/2 belong to the transport once one is given
+            transport = httpx.AsyncHTTPTransport(
+                retries=MAX_RETRIES,
+                limits=httpx.Limits(
+                    max_connections=self.max_connections,
+                    max_keepalive_connections=self.max_connections
+                ),
+                http2=HTTP2_AVAILABLE
+            )
+            self._async_client = httpx.AsyncClient(
+                headers=self.headers,
+                timeout=httpx.Timeout(None, connect=5.0),
+                transport=transport
+            )
+
+        payload = self._build_payload(prompt)
+
+        try:
+            for attempt in range(MAX_RETRIES + 1):
+                response = await self._async_client.post(self.api_url, json=payload)
+                if response.status_code not in RETRY_STATUSES or attempt == MAX_RETRIES:
+                    break
+                delay = _retry_delay(response, attempt)
+                logging.warning(f"HTTP {response.status_code} from API, retrying in {delay:.1f}s")
+                await asyncio.sleep(delay)
+            response.raise_for_status()
+            chat_response = ChatResponse.from_json(response.content)
+
+            logging.debug(f"\nResponse From API {chat_response}\n")
+            return chat_response
+
+        except httpx.HTTPStatusError as e:
+            logging.error(f"HTTP error: {e}")
+        except httpx.ConnectError as e:
+            logging.error(f"Connection error: {e}")
+        except httpx.TimeoutException as e:
+            logging.error(f"Timeout error: {e}")
+        except httpx.RequestError as e:
+            logging.error(f"Error communicating with the API: {e}")
+        except ValueError as e:
+            logging.error(f"Error parsing JSON response: {e}")
+        return None
+
+    async def aclose(self):
+        """Close the shared async HTTP client."""
+        if self._async_client is not None:
+            await self._async_client.aclose()
+            self._async_client = None
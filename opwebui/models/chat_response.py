@@ -1,53 +1,46 @@
-from dataclasses import dataclass
-from typing import List, Optional, Dict
-
-@dataclass
-class Message:
-    role: str
-    content: str
-
-@dataclass
-class Choice:
-    index: int
-    finish_reason: str
-    message: Message
-
-@dataclass
-class ChatResponse:
-    id: str
-    created: int
-    model: str
-    choices: List[Choice]
-    total_tokens: int
-    prompt_tokens: int
-    completion_tokens: int
+import msgspec
+
+from typing import List, Optional, Dict, Union
+
+# Decoding is lax (strict=False) and every field has a default, so odd but
+# usable payloads, e.g. a float timestamp or a numeric id, still decode
+
+class Message(msgspec.Struct):
+    role: Optional[str] = None
+    content: Optional[str] = None
+
+class Choice(msgspec.Struct):
+    index: Optional[int] = 0
+    message: Message = msgspec.field(default_factory=Message)
+    finish_reason: Optional[str] = ""
+
+class ChatResponse(
+    msgspec.Struct,
+    rename={
+        "response_token_per_s": "response_token/s",
+        "prompt_token_per_s": "prompt_token/s"
+    }
+):
+    id: Optional[Union[str, int]] = None
+    created: Optional[Union[int, float]] = None
+    model: Optional[str] = None
+    choices: List[Choice] = []
+    total_tokens: Optional[Union[int, float]] = 0
+    prompt_tokens: Optional[Union[int, float]] = 0
+    completion_tokens: Optional[Union[int, float]] = 0
     response_token_per_s: Optional[float] = None
     prompt_token_per_s: Optional[float] = None
-    total_duration: Optional[int] = None
+    total_duration: Optional[Union[int, float]] = None
     approximate_total: Optional[str] = None
 
     @classmethod
     def from_dict(cls, data: Dict):
-        choices = [
-            Choice(
-                index=c["index"],
-                finish_reason=c.get("finish_reason", ""),
-                message=Message(
-                    role=c["message"]["role"],
-                    content=c["message"]["content"]
-                )
-            ) for c in data.get("choices", [])
-        ]
-        return cls(
-            id=data["id"],
-            created=data["created"],
-            model=data["model"],
-            choices=choices,
-            total_tokens=data.get("total_tokens", 0),
-            prompt_tokens=data.get("prompt_tokens", 0),
-            completion_tokens=data.get("completion_tokens", 0),
-            response_token_per_s=data.get("response_token/s"),
-            prompt_token_per_s=data.get("prompt_token/s"),
-            total_duration=data.get("total_duration"),
-            approximate_total=data.get("approximate_total")
-        )
\ No newline at end of file
+        return msgspec.convert(data, cls, strict=False)
+
+    @classmethod
+    def from_json(cls, raw: bytes):
+        """Decode a raw JSON response body straight into a ChatResponse."""
+        return _DECODER.decode(raw)
+
+
+_DECODER = msgspec.json.Decoder(ChatResponse, strict=False)
@@ -0,0 +1,54 @@
+import json
+import unittest
+
+from opwebui.models.chat_response import ChatResponse
+
+
+class ChatResponseDecodeTest(unittest.TestCase):
+    def test_well_formed_payload(self):
+        raw = json.dumps({
+            "id": "chatcmpl-1",
+            "created": 1712345678,
+            "model": "llama3",
+            "choices": [{"index": 0, "finish_reason": "stop",
+                         "message": {"role": "assistant", "content": "Restart the VM."}}],
+            "total_tokens": 42,
+            "response_token/s": 12.5
+        }).encode()
+
+        response = ChatResponse.from_json(raw)
+
+        self.assertEqual(response.choices[0].message.content, "Restart the VM.")
+        self.assertEqual(response.total_tokens, 42)
+        self.assertEqual(response.response_token_per_s, 12.5)
+
+    def test_loosely_typed_payload(self):
+        # Float timestamp, numeric id, token counts as strings, missing fields
+        raw = json.dumps({
+            "id": 7,
+            "created": 1712345678.25,
+            "choices": [{"message": {"content": "Reinstall the app."}}],
+            "total_tokens": "42",
+            "response_token/s": "12.5",
+            "unexpected": {"nested": True}
+        }).encode()
+
+        response = ChatResponse.from_json(raw)
+
+        self.assertEqual(response.id, 7)
+        self.assertEqual(response.created, 1712345678.25)
+        self.assertIsNone(response.model)
+        self.assertEqual(response.choices[0].index, 0)
+        self.assertEqual(response.choices[0].message.content, "Reinstall the app.")
+        self.assertEqual(response.total_tokens, 42)
+        self.assertEqual(response.response_token_per_s, 12.5)
+
+    def test_from_dict_is_lax_too(self):
+        response = ChatResponse.from_dict({"created": 1.5, "choices": [{}]})
+
+        self.assertEqual(response.created, 1.5)
+        self.assertIsNone(response.choices[0].message.content)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -1,13 +1,27 @@
 import os
 import re
 import logging
-import traceback
-import pandas as pd
 
+from openpyxl import load_workbook
 from dataclasses import dataclass, field
 from typing import List, Dict, Any
+from concurrent.futures import ThreadPoolExecutor
 
-@dataclass
+try:
+    from python_calamine import CalamineWorkbook
+    CALAMINE_AVAILABLE = True
+except ImportError:
+    CALAMINE_AVAILABLE = False
+
+def _isna(value):
+    """Whether a cell value is empty (None or NaN), without pandas' array dispatch."""
+    return value is None or (isinstance(value, float) and value != value)
+
+# Patterns applied to every parsed cell
+_DIGITS_RE = re.compile(r'\d+')
+_TITLE_RE = re.compile(r'(Solutions \d+)')
+
+@dataclass(slots=True)
 class Solution:
     """Class for representing a solution."""
     id: int
@@ -15,8 +29,13 @@ class Solution:
     steps: List[str]
     full_text: str
     error_message: str = ""
+    text: str = field(init=False, repr=False)
+
+    def __post_init__(self):
+        # Steps joined once here instead of every time the solution is scored
+        self.text = " ".join(self.steps)
 
-@dataclass
+@dataclass(slots=True)
 class Question:
     """Class for representing a question."""
     id: int
@@ -92,21 +111,33 @@ class DataExtractor:
     def load_and_parse_data(self):
         """Load and parse both questions and solutions data."""
         try:
-            # Load question data
-            q_handler = self._load_excel(
-                self.questions_path,
-                sheet_name=self.questions_config['sheet_name'],
-                header=self.questions_config['header_row']
-            )
-            
-            # Load answer data
-            a_handler = self._load_excel(
-                self.answers_path,
-                sheet_name=self.answers_config['sheet_name'],
-                header=self.answers_config['header_row']
-            )
+            # Read both workbooks at the same time; each load is mostly file and XML work
+            with ThreadPoolExecutor(max_workers=2) as executor:
+                # Load question data
+                q_future = executor.submit(
+                    self._load_excel,
+                    self.questions_path,
+                    sheet_name=self.questions_config['sheet_name'],
+                    header=self.questions_config['header_row'],
+                    max_col=self._columns_needed(
+                        self.questions_config, ('issue_col', 'solutions_col', 'ai_solutions_col')
+                    )
+                )
+                
+                # Load answer data
+                a_future = executor.submit(
+                    self._load_excel,
+                    self.answers_path,
+                    sheet_name=self.answers_config['sheet_name'],
+                    header=self.answers_config['header_row'],
+                    max_col=self._columns_needed(self.answers_config, ('solution_col', 'error_col'))
+                )
+                
+                q_handler = q_future.result()
+                a_handler = a_future.result()
             
-            # Parse questions
+            # Parse questions (sequentially: they read self.solutions, which
+            # _parse_solutions replaces)
             self._parse_questions(q_handler)
             
             # Parse solutions
@@ -118,55 +149,141 @@ class DataExtractor:
             logging.error(f"Error loading or parsing data: {str(e)}")
             raise
     
-    def _load_excel(self, path, sheet_name=None, header=0):
-        """Load Excel file with specified parameters."""
+    def _columns_needed(self, config, keys):
+        """
+        Number of leading columns that hold every configured column.
+        
+        Returns:
+            int: One past the rightmost configured column, or None if a column
+                is given by header name and its position is only known after loading.
+        """
+        max_col = 0
+        for key in keys:
+            column_key = config.get(key)
+            if not column_key:
+                continue
+            if not (isinstance(column_key, str) and len(column_key) <= 2 and column_key.isalpha()):
+                return None
+            max_col = max(max_col, self._col_to_idx(column_key) + 1)
+        return max_col or None
+    
+    def _load_excel(self, path, sheet_name=None, header=0, max_col=None):
+        """
+        Load an Excel sheet as a header row and a list of data rows.
+        
+        Uses the Rust calamine parser when python-calamine is installed, and
+        otherwise openpyxl in read-only mode, which streams cells as plain
+        values instead of building the full workbook object graph.
+        
+        Only the header row and the rows below it are materialised, and only
+        the first max_col columns of each when given.
+        
+        Returns:
+            tuple: (header tuple, list of row tuples following the header)
+        """
         try:
-            if sheet_name:
-                return pd.read_excel(path, sheet_name=sheet_name, header=header)
+            if CALAMINE_AVAILABLE:
+                rows = self._read_rows_calamine(path, sheet_name, first_row=header, max_col=max_col)
             else:
-                # If no sheet name specified, try to get the first sheet
-                return pd.read_excel(path, header=header)
+                workbook = load_workbook(path, read_only=True, data_only=True)
+                try:
+                    # If no sheet name specified, use the first sheet
+                    worksheet = workbook[sheet_name] if sheet_name else workbook.worksheets[0]
+                    # openpyxl rows are 1-based; rows above the header are never built
+                    rows = list(worksheet.iter_rows(min_row=header + 1, max_col=max_col, values_only=True))
+                finally:
+                    workbook.close()
         except Exception as e:
             logging.error(f"Error loading Excel file {path}: {str(e)}")
             if sheet_name:
                 logging.error(f"Check that sheet '{sheet_name}' exists")
             raise
+
+        # Drop trailing empty rows, as pandas does
+        while rows and all(value is None for value in rows[-1]):
+            rows.pop()
+
+        header_row = rows[0] if rows else ()
+        return header_row, rows[1:]
+    
+    @staticmethod
+    def _read_rows_calamine(path, sheet_name=None, first_row=0, max_col=None):
+        """Read a sheet from first_row on with calamine, with values normalised to what openpyxl returns."""
+        workbook = CalamineWorkbook.from_path(path)
+        try:
+            # If no sheet name specified, use the first sheet
+            sheet = workbook.get_sheet_by_name(sheet_name) if sheet_name else workbook.get_sheet_by_index(0)
+            # Keep leading empty rows and columns so positions match the sheet's A1 layout
+            raw_rows = sheet.to_python(skip_empty_area=False)[first_row:]
+        finally:
+            workbook.close()
+
+        # calamine reports empty cells as "" and every number as a float
+        def normalise(value):
+            if value == "":
+                return None
+            if isinstance(value, float) and value.is_integer():
+                return int(value)
+            return value
+
+        return [tuple(normalise(value) for value in row[:max_col]) for row in raw_rows]
     
-    def _get_column_value(self, row, column_key):
-        """Get value from a row using either column name or letter index."""
+    @staticmethod
+    def _col_to_idx(letters):
+        """Convert an Excel column letter (A, B, ..., Z, AA, ...) to a 0-based index."""
+        col_idx = 0
+        for char in letters.upper():
+            col_idx = col_idx * 26 + (ord(char) - ord('A') + 1)
+        return col_idx - 1
+    
+    def _column_index(self, column_key, header=()):
+        """Resolve a column name or letter index to a 0-based position in each row."""
         if column_key is None:
             return None
             
         # If column_key is a letter (A, B, C, etc.)
         if isinstance(column_key, str) and len(column_key) <= 2 and column_key.isalpha():
-            # Convert column letter to 0-based column index
-            col_idx = 0
-            for char in column_key:
-                col_idx = col_idx * 26 + (ord(char.upper()) - ord('A'))
-            
-            # Check if index exists in row
-            if col_idx < len(row):
-                return row.iloc[col_idx]
-            return None
+            return self._col_to_idx(column_key)
             
-        # If column_key is already a column name in the DataFrame
-        if column_key in row.index:
-            return row[column_key]
+        # If column_key is a column name from the header row
+        if column_key in header:
+            return header.index(column_key)
             
         return None
     
+    @staticmethod
+    def _cell(row, col_idx):
+        """Get a row's value at a resolved column index, or None if missing."""
+        if col_idx is None or col_idx >= len(row):
+            return None
+        return row[col_idx]
+    
     def _parse_questions(self, q_handler):
-        """Parse questions from DataFrame."""
+        """Parse questions from the loaded sheet rows."""
         self.questions = []
+        header, rows = q_handler
+        
+        # Resolve the configured columns once rather than per row
+        issue_idx = self._column_index(self.questions_config['issue_col'], header)
+        sol_idx = self._column_index(self.questions_config['solutions_col'], header)
+        ai_idx = self._column_index(self.questions_config['ai_solutions_col'], header)
+        
+        # Solution cells repeat a handful of values, so each distinct one is parsed once
+        parsed_idx = {}
+        def parse_idx(value):
+            if value not in parsed_idx:
+                parsed_idx[value] = self._parse_solutions_idx(value)
+            return list(parsed_idx[value])
         
-        for i in range(len(q_handler)):
+        # Bound once; these run for every row
+        append_question = self.questions.append
+        isna = _isna
+        
+        for i, row in enumerate(rows):
             try:
-                # Get the current row
-                row = q_handler.iloc[i]
-                
                 # Get question text from the specified column
-                question_text = self._get_column_value(row, self.questions_config['issue_col'])
-                if pd.isna(question_text):
+                question_text = self._cell(row, issue_idx)
+                if isna(question_text):
                     question_text = ""
                 
                 # Create question object
@@ -177,22 +294,21 @@ class DataExtractor:
                 
                 # Get solutions used if column is specified
                 if self.questions_config['solutions_col']:
-                    solutions_value = self._get_column_value(row, self.questions_config['solutions_col'])
-                    question.solutions_used = self._parse_solutions_idx(solutions_value)
+                    solutions_value = self._cell(row, sol_idx)
+                    question.solutions_used = parse_idx(solutions_value)
                 
                 # Get AI solutions if column is specified
                 if self.questions_config['ai_solutions_col']:
-                    ai_solutions_value = self._get_column_value(row, self.questions_config['ai_solutions_col'])
-                    question.ai_solutions_used = self._parse_solutions_idx(ai_solutions_value)
+                    ai_solutions_value = self._cell(row, ai_idx)
                     # Check if the value is 0 or empty
-                    if (isinstance(ai_solutions_value, (int, float)) and ai_solutions_value == 0) or pd.isna(ai_solutions_value):
+                    if (isinstance(ai_solutions_value, (int, float)) and ai_solutions_value == 0) or isna(ai_solutions_value):
                         # If AI solution is 0, use all solutions for comparison
                         logging.debug(f"Question {i+1}: AI solution value is {ai_solutions_value}, using all solutions")
                         question.ai_solutions_used = list(range(1, len(self.solutions) + 1)) if hasattr(self, 'solutions') else []
                     else:
-                        question.ai_solutions_used = self._parse_solutions_idx(ai_solutions_value)
+                        question.ai_solutions_used = parse_idx(ai_solutions_value)
                 
-                self.questions.append(question)
+                append_question(question)
                 
             except Exception as e:
                 logging.warning(f"Error parsing question at index {i}: {str(e)}")
@@ -205,87 +321,73 @@ class DataExtractor:
         - Special strings like "self resolved" return an empty list
         - If no valid solutions found, return empty list
         """
-        if pd.isna(value):
-            return []
-        
-        # If it's already a list
-        if isinstance(value, list):
-            return [int(x) for x in value if not pd.isna(x)]
-        
-        # If it's a string
+        # Cells are mostly strings, so dispatch on type before any NaN check
         if isinstance(value, str):
-            # Special case: Handle text like "3 & 4" or "3,4"
+            # Numbers separated by anything, e.g. "3", "3 & 4" or "3,4"
+            values = _DIGITS_RE.findall(value)
+            if values:
+                return list(map(int, values))
+            
+            # Delimiters without any numbers, e.g. "&"
             if "&" in value or "," in value:
-                try:
-                    # Replace "&" with space to standardize
-                    value = value.replace("&", " ").replace(",", " ")
-                    # Extract all numbers
-                    values = re.findall(r'\d+', value)
-                    return [int(x) for x in values]
-                except Exception as e:
-                    logging.debug(f"Error parsing solution string '{value}': {str(e)}")
-                    return []
+                return []
             
             # Special case: Handle text like "self resolved" or other non-numeric strings
-            if not re.search(r'\d+', value):
-                # For special strings, return all list
-                logging.debug(f"Special solution string detected: '{value}'. Using all available solutions for comparison.")
-                return list(range(1, len(self.solutions) + 1)) if hasattr(self, 'solutions') else []            
-            
-            # Normal case: Extract numbers from the string
-            try:
-                values = re.findall(r'\d+', value)
-                return [int(x) for x in values]
-            except Exception as e:
-                logging.debug(f"Error extracting numbers from '{value}': {str(e)}")
-                return []
+            logging.debug(f"Special solution string detected: '{value}'. Using all available solutions for comparison.")
+            return list(range(1, len(self.solutions) + 1)) if hasattr(self, 'solutions') else []
         
         # If it's a single number
-        if isinstance(value, (int, float)) and not pd.isna(value):
-            return [int(value)]
+        if isinstance(value, (int, float)):
+            return [] if _isna(value) else [int(value)]
+        
+        # If it's already a list
+        if isinstance(value, list):
+            return [int(x) for x in value if not _isna(x)]
         
         return []
     
     def _parse_solutions(self, a_handler):
-        """Parse solutions from DataFrame."""
+        """Parse solutions from the loaded sheet rows."""
         self.solutions = []
+        header, rows = a_handler
         
-        # Check if a_handler is a dict (which happens when there are multiple sheets)
-        if isinstance(a_handler, dict):
-            # Use the first sheet if it's a dict of DataFrames
-            sheet_name = list(a_handler.keys())[0]  
-            logging.info(f"Multiple sheets found in solutions file, using: {sheet_name}")
-            a_handler = a_handler[sheet_name]
+        # Resolve the configured columns once rather than per row
+        solution_idx = self._column_index(self.answers_config['solution_col'], header)
+        error_idx = self._column_index(self.answers_config['error_col'], header)
+        
+        # Bound once; these run for every row
+        append_solution = self.solutions.append
+        isna = _isna
         
         # Loop through each row
-        for i in range(len(a_handler)):
+        for i, row in enumerate(rows):
             try:
-                # Get the current row
-                row = a_handler.iloc[i]
-                
                 # Get solution text from the specified column
-                solution_text = self._get_column_value(row, self.answers_config['solution_col'])
-                if pd.isna(solution_text):
+                solution_text = self._cell(row, solution_idx)
+                if isna(solution_text):
                     continue
                 
                 # Get error message if column is specified
                 error_message = ""
                 if self.answers_config['error_col']:
-                    error_value = self._get_column_value(row, self.answers_config['error_col'])
-                    if not pd.isna(error_value):
+                    error_value = self._cell(row, error_idx)
+                    if not isna(error_value):
                         error_message = str(error_value)
                 
                 solution = self._parse_one_solution(i+1, solution_text, error_message)
-                self.solutions.append(solution)
+                append_solution(solution)
                 
             except Exception as e:
-                logging.warning(f"Error parsing solution at index {i}: {str(e)}")
-                traceback.print_exc()  # Add this to get more details about the error
+                # Full traceback only when debugging, so a malformed sheet doesn't flood stderr
+                logging.warning(
+                    f"Error parsing solution at index {i}: {str(e)}",
+                    exc_info=logging.getLogger().isEnabledFor(logging.DEBUG)
+                )
     
     def _parse_one_solution(self, index, solution_text, error_message=""):
         """Parse a solution from the answer excel text into a Solution object."""
         # Extract solution title (e.g., "Solutions 1")
-        title_match = re.match(r"(Solutions \d+).*?(?:\n|$)", solution_text)
+        title_match = _TITLE_RE.match(solution_text)
         title = title_match.group(1) if title_match else f"Solution {index}"
         
         # Split the text into steps
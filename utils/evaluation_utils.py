@@ -1,15 +1,41 @@
 import os
 import re
-import pandas as pd
+import mmap
+import logging
+import xlsxwriter
+import numpy as np
 
 from pathlib import Path
+from functools import lru_cache, partial
 from datetime import datetime
 
+# Scores are judged at the precision the feedback prints them with, so
+# responses with practically equal scores share one memoized verdict
+SCORE_DECIMALS = 4
+
+def rounded_scores(metrics):
+    """
+    Extract the scores a quality verdict depends on, rounded to SCORE_DECIMALS.
+    
+    Args:
+        metrics: Dictionary of evaluation metrics
+        
+    Returns:
+        tuple: (bert_f1, trad_f1, bleu, combined_score) as floats
+    """
+    return tuple(np.round([
+        metrics.get('bert_f1', 0),
+        metrics.get('trad_f1', 0),
+        metrics.get('bleu', 0),
+        metrics.get('combined_score', 0)
+    ], SCORE_DECIMALS).tolist())
+
 def assess_response_quality(metrics, 
                            bert_threshold=0.5, 
                            f1_threshold=0.3, 
                            bleu_threshold=0.1,
-                           combined_threshold=0.4):
+                           combined_threshold=0.4,
+                           return_flags=False):
     """
     Assess the quality of a response based on evaluation metrics.
     
@@ -19,56 +45,119 @@ def assess_response_quality(metrics,
         f1_threshold: Minimum acceptable traditional F1 score
         bleu_threshold: Minimum acceptable BLEU score
         combined_threshold: Minimum acceptable combined score
+        return_flags: Also return which metrics fell below their threshold
         
     Returns:
-        tuple: (is_acceptable, feedback_message)
+        tuple: (is_acceptable, feedback_message), or with return_flags
+            (is_acceptable, feedback_message, (bert_failed, f1_failed, bleu_failed, combined_failed))
     """
-    is_acceptable = True
-    feedback = []
+    # Rounded, hashable scalars so near-identical scores reuse the same verdict
+    result = _assess_scores(
+        *rounded_scores(metrics),
+        bert_threshold,
+        f1_threshold,
+        bleu_threshold,
+        combined_threshold
+    )
+    return result if return_flags else result[:2]
+
+def make_assessor(bert_threshold=0.5,
+                  f1_threshold=0.3,
+                  bleu_threshold=0.1,
+                  combined_threshold=0.4):
+    """
+    Build an assess_response_quality with the thresholds fixed up front.
     
-    bert_score = metrics.get('bert_f1', 0)
-    f1_score = metrics.get('trad_f1', 0)
-    bleu_score = metrics.get('bleu', 0)
-    combined_score = metrics.get('combined_score', 0)
+    Useful when many responses are judged against the same thresholds, so
+    they are bound once instead of being passed on every call.
     
-    # Check if metrics meet thresholds
-    if bert_score < bert_threshold:
-        is_acceptable = False
-        feedback.append(f"BERTScore ({bert_score:.4f}) below threshold ({bert_threshold:.2f})")
+    Args:
+        bert_threshold: Minimum acceptable BERTScore
+        f1_threshold: Minimum acceptable traditional F1 score
+        bleu_threshold: Minimum acceptable BLEU score
+        combined_threshold: Minimum acceptable combined score
         
-    if f1_score < f1_threshold:
-        is_acceptable = False
-        feedback.append(f"F1 score ({f1_score:.4f}) below threshold ({f1_threshold:.2f})")
-    
-    if bleu_score < bleu_threshold:
-        is_acceptable = False
-        feedback.append(f"BLEU score ({bleu_score:.4f}) below threshold ({bleu_threshold:.2f})")
-    
-    # Consider combined score as well
-    if combined_score < combined_threshold:
-        is_acceptable = False
-        feedback.append(f"Combined score ({combined_score:.4f}) below threshold ({combined_threshold:.2f})")
-    
-    # But if combined score is very good, accept despite individual failures
-    if combined_score >= combined_threshold * 1.25:
-        is_acceptable = True
-        feedback = [f"Combined score ({combined_score:.4f}) indicates good quality despite some low metrics"]
-    
-    if is_acceptable:
-        return True, "Response meets quality standards."
-    else:
-        feedback_message = "Response quality issues detected:\n- " + "\n- ".join(feedback)
-        feedback_message += "\n\nSuggested actions:\n"
+    Returns:
+        callable: assess(metrics, return_flags=False), returning the same as
+            assess_response_quality with these thresholds
+    """
+    return partial(
+        assess_response_quality,
+        bert_threshold=bert_threshold,
+        f1_threshold=f1_threshold,
+        bleu_threshold=bleu_threshold,
+        combined_threshold=combined_threshold
+    )
+
+def assess_response_quality_batch(scores,
+                                 bert_threshold=0.5,
+                                 f1_threshold=0.3,
+                                 bleu_threshold=0.1,
+                                 combined_threshold=0.4):
+    """
+    Vectorized pass/fail verdicts for many responses at once.
+    
+    Gives the same is_acceptable as assess_response_quality for each row,
+    scores rounded to SCORE_DECIMALS alike, without building any feedback text.
+    
+    Args:
+        scores: (N, 4) array of BERTScore F1, traditional F1, BLEU and combined score
+        bert_threshold: Minimum acceptable BERTScore
+        f1_threshold: Minimum acceptable traditional F1 score
+        bleu_threshold: Minimum acceptable BLEU score
+        combined_threshold: Minimum acceptable combined score
         
-        if bert_score < bert_threshold:
-            feedback_message += "- Improve semantic relevance to the question\n"
-        if f1_score < f1_threshold:
-            feedback_message += "- Include more key terms from the reference solution\n"
-        if bleu_score < bleu_threshold:
-            feedback_message += "- Structure the response more similarly to reference solutions\n"
-            
-        feedback_message += "\nPlease provide more detailed context or a more specific query."
-        return False, feedback_message
+    Returns:
+        tuple: ((N,) bool array of acceptable rows, (N, 4) bool array of failed thresholds)
+    """
+    scores = np.round(np.asarray(scores, dtype=np.float64).reshape(-1, 4), SCORE_DECIMALS)
+    thresholds = np.array([bert_threshold, f1_threshold, bleu_threshold, combined_threshold])
+    
+    fails = scores < thresholds
+    is_acceptable = ~fails.any(axis=1) | (scores[:, 3] >= combined_threshold * 1.25)
+    return is_acceptable, fails
+
+@lru_cache(maxsize=2048)
+def _assess_scores(bert_score, f1_score, bleu_score, combined_score,
+                   bert_threshold, f1_threshold, bleu_threshold, combined_threshold):
+    """Memoized core of assess_response_quality."""
+    # Each threshold is compared once; callers get the flags back too
+    flags = (
+        bert_score < bert_threshold,
+        f1_score < f1_threshold,
+        bleu_score < bleu_threshold,
+        combined_score < combined_threshold
+    )
+    bert_failed, f1_failed, bleu_failed, combined_failed = flags
+    
+    # Passing every threshold, or a very good combined score despite individual
+    # failures, is acceptable and needs no feedback
+    if combined_score >= combined_threshold * 1.25 or not any(flags):
+        return True, "Response meets quality standards.", flags
+    
+    # Message lines, joined once at the end
+    lines = ["Response quality issues detected:"]
+    
+    # Check if metrics meet thresholds
+    if bert_failed:
+        lines.append(f"- BERTScore ({bert_score:.4f}) below threshold ({bert_threshold:.2f})")
+    if f1_failed:
+        lines.append(f"- F1 score ({f1_score:.4f}) below threshold ({f1_threshold:.2f})")
+    if bleu_failed:
+        lines.append(f"- BLEU score ({bleu_score:.4f}) below threshold ({bleu_threshold:.2f})")
+    if combined_failed:
+        lines.append(f"- Combined score ({combined_score:.4f}) below threshold ({combined_threshold:.2f})")
+    
+    lines += ["", "Suggested actions:"]
+    if bert_failed:
+        lines.append("- Improve semantic relevance to the question")
+    if f1_failed:
+        lines.append("- Include more key terms from the reference solution")
+    if bleu_failed:
+        lines.append("- Structure the response more similarly to reference solutions")
+    
+    lines += ["", "Please provide more detailed context or a more specific query."]
+    return False, "\n".join(lines), flags
 
 def generate_report(questions, solutions, metrics_by_question, enhanced_prompt=None, output_dir="reports",
                    bert_threshold=0.5, 
@@ -89,85 +178,126 @@ def generate_report(questions, solutions, metrics_by_question, enhanced_prompt=N
         combined_threshold: Threshold for combined score
         
     Returns:
-        str: Path to the generated report file
+        str: Path to the generated report file, or None if there are no results
     """
+    # Nothing to average or report
+    if not metrics_by_question:
+        logging.warning("No evaluation results to report.")
+        return None
+    
     # Create output directory if it doesn't exist
     os.makedirs(output_dir, exist_ok=True)
     
-    # Calculate average scores
-    avg_bert = sum(m['metrics']['bert_f1'] for m in metrics_by_question.values()) / len(metrics_by_question)
-    avg_f1 = sum(m['metrics']['trad_f1'] for m in metrics_by_question.values()) / len(metrics_by_question)
-    avg_bleu = sum(m['metrics']['bleu'] for m in metrics_by_question.values()) / len(metrics_by_question)
-    avg_combined = sum(m['metrics'].get('combined_score', 0) for m in metrics_by_question.values()) / len(metrics_by_question)
+    # Calculate average scores in one pass over the results, filling the array directly
+    scores = np.fromiter(
+        (
+            score
+            for m in metrics_by_question.values()
+            for score in (m['metrics']['bert_f1'], m['metrics']['trad_f1'],
+                          m['metrics']['bleu'], m['metrics'].get('combined_score', 0))
+        ),
+        dtype=np.float64,
+        count=4 * len(metrics_by_question)
+    ).reshape(-1, 4)
+    avg_bert, avg_f1, avg_bleu, avg_combined = scores.mean(axis=0)
     
-    # Generate timestamp for the report filename
-    timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
+    # Pass/fail for every question in one vectorized compare; feedback text is
+    # only built for the questions that fail
+    acceptable, _ = assess_response_quality_batch(
+        scores, bert_threshold, f1_threshold, bleu_threshold, combined_threshold
+    )
+    acceptable_by_id = dict(zip(metrics_by_question, acceptable.tolist()))
+    assess = make_assessor(bert_threshold, f1_threshold, bleu_threshold, combined_threshold)
+    
+    # Generate timestamp for the report filename; the header reuses the same moment
+    now = datetime.now()
+    timestamp = now.strftime("%Y%m%d_%H%M%S")
     report_path = os.path.join(output_dir, f"evaluation_report_{timestamp}.txt")
     
-    # Write the report to a file
-    with open(report_path, 'w', encoding='utf-8') as f:
-        f.write(f"# KB Answer Evaluation Report\n")
-        f.write(f"Generated: {datetime.now().strftime('%Y-%m-%d %H:%M:%S')}\n\n")
+    # Build the whole report in memory and write it with a single call
+    parts = [
+        f"# KB Answer Evaluation Report\n"
+        f"Generated: {now.strftime('%Y-%m-%d %H:%M:%S')}\n\n"
+        f"## Overall Statistics\n"
+        f"Total Questions Evaluated: {len(metrics_by_question)}\n"
+        f"Average BERTScore: {avg_bert:.4f}\n"
+        f"Average F1 Score: {avg_f1:.4f}\n"
+        f"Average BLEU Score: {avg_bleu:.4f}\n\n"
+        f"Average Combined Score: {avg_combined:.4f}\n\n"
+        f"## Detailed Results\n\n"
+    ]
+    
+    solutions_by_id = {s.id: s for s in reversed(solutions)}
+    
+    # Process each question with metrics
+    for question in questions:
+        if question.id not in metrics_by_question:
+            continue
+            
+        data = metrics_by_question[question.id]
+        metrics = data['metrics']
         
-        # Write overall statistics
-        f.write(f"## Overall Statistics\n")
-        f.write(f"Total Questions Evaluated: {len(metrics_by_question)}\n")
-        f.write(f"Average BERTScore: {avg_bert:.4f}\n")
-        f.write(f"Average F1 Score: {avg_f1:.4f}\n")
-        f.write(f"Average BLEU Score: {avg_bleu:.4f}\n\n")
-        f.write(f"Average Combined Score: {avg_combined:.4f}\n\n")
+        # Find the best matching solution
+        best_solution = solutions_by_id.get(data['best_solution_id'])
+        if not best_solution:
+            continue
         
-        # Write detailed results for each question
-        f.write(f"## Detailed Results\n\n")
+        if acceptable_by_id[question.id]:
+            is_acceptable, feedback = True, "Response meets quality standards."
+        else:
+            is_acceptable, feedback = assess(metrics)
+        steps = "".join(f"  {step}\n" for step in best_solution.steps)
         
-        # Process each question with metrics
-        for question in questions:
-            if question.id not in metrics_by_question:
-                continue
-                
-            data = metrics_by_question[question.id]
-            metrics = data['metrics']
-            best_solution_id = data['best_solution_id']
-            model_response = data['model_response']
-            
-            # Find the best matching solution
-            best_solution = next((s for s in solutions if s.id == best_solution_id), None)
-            if not best_solution:
-                continue
-                
-            f.write(f"{'='*80}\n")
-            f.write(f"### Question {question.id}\n")
-            f.write(f"Issue: {question.issue}\n\n")
-            
-            f.write(f"### Model Response\n{model_response}\n\n")
-            
-            f.write(f"### Best Matching Solution ({best_solution.id})\n")
-            f.write(f"Title: {best_solution.title}\n\n")
-            f.write("Steps:\n")
-            for step in best_solution.steps:
-                f.write(f"  {step}\n")
-            f.write("\n")
-            
-            f.write(f"### Evaluation Metrics\n")
-            f.write(f"  BERTScore: {metrics['bert_f1']:.4f} (P={metrics['bert_precision']:.4f}, R={metrics['bert_recall']:.4f})\n")
-            f.write(f"  F1 Score:  {metrics['trad_f1']:.4f}\n")
-            f.write(f"  BLEU:      {metrics['bleu']:.4f}\n")
-            f.write(f"  Combined:  {metrics.get('combined_score', 0):.4f}\n\n")
-            
-            # Add quality assessment
-            f.write(f"### Quality Assessment\n")
-            is_acceptable, feedback = assess_response_quality(
-                metrics,
-                bert_threshold=bert_threshold,
-                f1_threshold=f1_threshold,
-                bleu_threshold=bleu_threshold,
-                combined_threshold=combined_threshold
-            )
-            
-            f.write(f"  Status: {'PASS' if is_acceptable else 'FAIL'}\n\n{feedback}\n\n")
+        parts.append(
+            f"{'=' * 80}\n"
+            f"### Question {question.id}\n"
+            f"Issue: {question.issue}\n\n"
+            f"### Model Response\n{data['model_response']}\n\n"
+            f"### Best Matching Solution ({best_solution.id})\n"
+            f"Title: {best_solution.title}\n\n"
+            f"Steps:\n{steps}\n"
+            f"### Evaluation Metrics\n"
+            f"  BERTScore: {metrics['bert_f1']:.4f} (P={metrics['bert_precision']:.4f}, R={metrics['bert_recall']:.4f})\n"
+            f"  F1 Score:  {metrics['trad_f1']:.4f}\n"
+            f"  BLEU:      {metrics['bleu']:.4f}\n"
+            f"  Combined:  {metrics.get('combined_score', 0):.4f}\n\n"
+            f"### Quality Assessment\n"
+            f"  Status: {'PASS' if is_acceptable else 'FAIL'}\n\n{feedback}\n\n"
+        )
+    
+    # One encode of the joined text and a raw binary write; skips the text
+    # layer's newline translation, so lines end in \n on every platform
+    with open(report_path, 'wb') as f:
+        f.write("".join(parts).encode('utf-8'))
     
     return report_path
 
+# Patterns for reading back the report written by generate_report
+# Reports are scanned as bytes straight from an mmap; lines end in \n, or \r\n on Windows
+_REPORT_SEPARATOR = b'=' * 80
+_QUESTION_ID_RE = re.compile(rb'### Question (\d+)')
+_ISSUE_RE = re.compile(rb'Issue: (.*?)(?:\r?\n\r?\n|\Z)', re.DOTALL)
+_QUALITY_RE = re.compile(rb'Status: (PASS|FAIL)')
+_METRIC_PATTERNS = [
+    ('bert_score', re.compile(rb'BERTScore: ([\d\.]+)')),
+    ('bert_precision', re.compile(rb'P=([\d\.]+)')),
+    ('bert_recall', re.compile(rb'R=([\d\.]+)')),
+    ('f1_score', re.compile(rb'F1 Score:  ([\d\.]+)')),
+    ('bleu_score', re.compile(rb'BLEU:      ([\d\.]+)')),
+    ('combined_score', re.compile(rb'Combined:  ([\d\.]+)'))
+]
+# The metrics and status lines exactly as generate_report lays them out, matched in one scan
+_METRICS_SECTION_RE = re.compile(
+    rb'BERTScore: (?P<bert_score>[\d\.]+) \(P=(?P<bert_precision>[\d\.]+), R=(?P<bert_recall>[\d\.]+)\)\r?\n'
+    rb'  F1 Score:  (?P<f1_score>[\d\.]+)\r?\n'
+    rb'  BLEU:      (?P<bleu_score>[\d\.]+)\r?\n'
+    rb'  Combined:  (?P<combined_score>[\d\.]+)\r?\n\r?\n'
+    rb'### Quality Assessment\r?\n'
+    rb'  Status: (?P<quality_pass>PASS|FAIL)'
+)
+
+_REPORT_COLUMNS = ['question_id', 'issue', *(key for key, _ in _METRIC_PATTERNS), 'quality_pass']
+
 def extract_metrics_from_report(report_file):
     """
     Extract evaluation metrics from a report file.
@@ -178,69 +308,76 @@ def extract_metrics_from_report(report_file):
     Returns:
         dict: Dictionary of extracted metrics
     """
-    metrics_data = {
-        'question_id': [],
-        'issue': [],
-        'bert_score': [],
-        'bert_precision': [],
-        'bert_recall': [],
-        'f1_score': [],
-        'bleu_score': [],
-        'combined_score': [],
-        'quality_pass': []
-    }
-    
-    with open(report_file, 'r', encoding='utf-8') as f:
-        content = f.read()
-    
-    # Extract questions and metrics
-    questions = re.split(r'={80}', content)
-    
-    for question in questions[1:]:  # Skip the header
-        # Extract question ID
-        question_id_match = re.search(r'### Question (\d+)', question)
-        if not question_id_match:
-            continue
-        question_id = question_id_match.group(1)
-        metrics_data['question_id'].append(question_id)
-        
-        # Extract issue
-        issue_match = re.search(r'Issue: (.*?)(?:\n\n|\Z)', question, re.DOTALL)
-        issue = issue_match.group(1).strip() if issue_match else "N/A"
-        metrics_data['issue'].append(issue)
-        
-        # Extract metrics
-        bert_score_match = re.search(r'BERTScore: ([\d\.]+)', question)
-        bert_score = float(bert_score_match.group(1)) if bert_score_match else 0
-        metrics_data['bert_score'].append(bert_score)
-        
-        bert_p_match = re.search(r'P=([\d\.]+)', question)
-        bert_p = float(bert_p_match.group(1)) if bert_p_match else 0
-        metrics_data['bert_precision'].append(bert_p)
-        
-        bert_r_match = re.search(r'R=([\d\.]+)', question)
-        bert_r = float(bert_r_match.group(1)) if bert_r_match else 0
-        metrics_data['bert_recall'].append(bert_r)
-        
-        f1_match = re.search(r'F1 Score:  ([\d\.]+)', question)
-        f1_score = float(f1_match.group(1)) if f1_match else 0
-        metrics_data['f1_score'].append(f1_score)
-        
-        bleu_match = re.search(r'BLEU:      ([\d\.]+)', question)
-        bleu_score = float(bleu_match.group(1)) if bleu_match else 0
-        metrics_data['bleu_score'].append(bleu_score)
-        
-        combined_match = re.search(r'Combined:  ([\d\.]+)', question)
-        combined_score = float(combined_match.group(1)) if combined_match else 0
-        metrics_data['combined_score'].append(combined_score)
+    rows = _extract_report_rows(report_file)
+    if not rows:
+        return {column: [] for column in _REPORT_COLUMNS}
+    return {column: list(values) for column, values in zip(_REPORT_COLUMNS, zip(*rows))}
+
+def _extract_report_rows(report_file):
+    """Extract one tuple per question from a report file, in _REPORT_COLUMNS order."""
+    # mmap cannot map an empty file, and an empty report has no questions anyway
+    if os.path.getsize(report_file) == 0:
+        return []
+    
+    with open(report_file, 'rb') as f, mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as content:
+        return _extract_rows_from_bytes(content)
+
+def _extract_rows_from_bytes(content):
+    """Parse report blocks out of a bytes-like object without copying or decoding it whole."""
+    rows = []
+    append_row = rows.append
+    
+    # Each question block runs from one separator to the next; the header before
+    # the first separator is skipped
+    separator_len = len(_REPORT_SEPARATOR)
+    start = content.find(_REPORT_SEPARATOR)
+    while start != -1:
+        start += separator_len
+        end = content.find(_REPORT_SEPARATOR, start)
+        block_end = end if end != -1 else len(content)
         
-        # Extract quality assessment
-        quality_match = re.search(r'(PASS|FAIL):', question)
-        quality = quality_match.group(1) if quality_match else "N/A"
-        metrics_data['quality_pass'].append(quality)
+        row = _parse_report_block(content, start, block_end)
+        if row:
+            append_row(row)
+        start = end
     
-    return metrics_data
+    return rows
 
+def _parse_report_block(content, start, end):
+    """Parse the question block in content[start:end], or return None if it has no question ID."""
+    # Extract question ID
+    question_id_match = _QUESTION_ID_RE.search(content, start, end)
+    if not question_id_match:
+        return None
+    question_id = question_id_match.group(1).decode('ascii')
+    
+    # Extract issue; only free text needs decoding, with line endings normalised as text mode did
+    issue_match = _ISSUE_RE.search(content, start, end)
+    if issue_match:
+        issue = issue_match.group(1).decode('utf-8').replace('\r\n', '\n').strip()
+    else:
+        issue = "N/A"
+    
+    # Metrics come after the (possibly long) model response, so only scan that tail
+    section_start = content.rfind(b"### Evaluation Metrics", start, end)
+    if section_start == -1:
+        section_start = start
+    
+    section_match = _METRICS_SECTION_RE.search(content, section_start, end)
+    if section_match:
+        scores = [float(section_match.group(key)) for key, _ in _METRIC_PATTERNS]
+        return (question_id, issue, *scores, section_match.group('quality_pass').decode('ascii'))
+    
+    # Hand-edited or partial sections: look for each value on its own
+    scores = []
+    for _, pattern in _METRIC_PATTERNS:
+        match = pattern.search(content, section_start, end)
+        scores.append(float(match.group(1)) if match else 0)
+    
+    # Extract quality assessment
+    quality_match = _QUALITY_RE.search(content, section_start, end)
+    quality = quality_match.group(1).decode('ascii') if quality_match else "N/A"
+    return (question_id, issue, *scores, quality)
 
 def export_report_to_excel(report_file=None):
     """
@@ -271,16 +408,18 @@ def export_report_to_excel(report_file=None):
         # Get the latest report file
         report_path = max(report_files, key=lambda p: p.stat().st_mtime)
     
-    # Extract metrics from the report
-    metrics = extract_metrics_from_report(report_path)
-    
-    # Create DataFrame
-    df = pd.DataFrame(metrics)
+    # Extract metrics from the report, already as one row per question
+    rows = _extract_report_rows(report_path)
     
     # Create output file path
     output_file = report_path.parent / f"{report_path.stem}.xlsx"
     
-    # Save to Excel
-    df.to_excel(output_file, index=False)
+    # Stream values straight to the sheet; constant_memory flushes each row as it is written
+    workbook = xlsxwriter.Workbook(str(output_file), {'constant_memory': True, 'strings_to_urls': False})
+    worksheet = workbook.add_worksheet()
+    worksheet.write_row(0, 0, _REPORT_COLUMNS)
+    for row, values in enumerate(rows, start=1):
+        worksheet.write_row(row, 0, values)
+    workbook.close()
     
     return str(output_file)
\ No newline at end of file
@@ -1,6 +1,29 @@
 import re
 
-from utils.evaluation_utils import assess_response_quality
+from functools import lru_cache
+from utils.evaluation_utils import assess_response_quality, rounded_scores
+
+# Question words; matched anywhere in the query, not just as whole words
+_WH_WORDS = ('how', 'why', 'what', 'when', 'where', 'which', 'who', 'is', 'are', 'can', 'could', 'should')
+_WH_SET = frozenset(_WH_WORDS)
+_WH_RE = re.compile('(' + '|'.join(_WH_WORDS) + ')')
+
+# Fixed parts of the prompt built by post_process when a response falls short
+_IMPROVED_PROMPT_HEADER = "I need more detailed information about this issue. My previous question was:\n\n"
+_IMPROVED_PROMPT_ISSUES = "\n\nThe previous response had these quality issues:\n"
+_IMPROVED_PROMPT_ASKS = "\n\nPlease provide a comprehensive answer with:\n"
+_FAILED_METRIC_REQUESTS = (
+    "- Better semantic relevance to my specific question\n",
+    "- More key technical terms and specific terminology\n",
+    "- Clearer structure similar to standard solutions\n",
+    "- A more comprehensive and detailed response\n"
+)
+_IMPROVED_PROMPT_FOOTER = (
+    "- Step-by-step instructions\n"
+    "- Relevant technical details\n"
+    "- Any specific commands or settings needed\n"
+    "- Common pitfalls to avoid"
+)
 
 class QueryEnchancer:
     def __init__(self):
@@ -38,6 +61,19 @@ class QueryEnchancer:
             "add or remove": "Need to use Add or Remove Programs for WhatsApp API? What are the steps?",
             "schedule-send": "Having issues with schedule-send feature in WhatsApp API."
         }
+        
+        # Most specific first: longer patterns such as "port 8000" win over "port"
+        # however the dict happens to be ordered (ties keep dict order)
+        self._issue_patterns = sorted(self.common_issues, key=len, reverse=True)
+        
+        # All patterns in one scan. The lookahead reports a match at every start
+        # position, overlapping ones included, and tries patterns in that order,
+        # so the lowest-indexed hit is the pattern a one-by-one substring test
+        # over the sorted list would find first
+        self._issue_priority = {pattern: i for i, pattern in enumerate(self._issue_patterns)}
+        self._issue_re = re.compile(
+            '(?=(' + '|'.join(map(re.escape, self._issue_patterns)) + '))'
+        )
 
     def pre_process(self, query):
         """
@@ -52,13 +88,14 @@ class QueryEnchancer:
         """
         query_lower = query.lower()
         
-        # Direct match with common issue patterns
-        for pattern, enhanced in self.common_issues.items():
-            if pattern in query_lower:
-                return enhanced
+        # Direct match with common issue patterns; the longest pattern found wins
+        priorities = [self._issue_priority[match.group(1)] for match in self._issue_re.finditer(query_lower)]
+        if priorities:
+            return self.common_issues[self._issue_patterns[min(priorities)]]
         
         # For very short queries without context
-        if len(query.split()) < 3:
+        words = query_lower.split()
+        if len(words) < 3:
             return f"I'm having this issue with WhatsApp API: {query}. Please provide detailed troubleshooting steps including any uninstall, reinstall, or system restart instructions that might be needed."
         
         # For queries that lack context, add some domain-specific context
@@ -66,12 +103,14 @@ class QueryEnchancer:
             return f"In the context of WhatsApp API technical support, I'm having this issue: {query}. Please provide step-by-step troubleshooting instructions."
         
         # For queries with domain context, but lacking specificity, add structure
-        if not re.search(r'(how|why|what|when|where|which|who|is|are|can|could|should)', query_lower):
+        # A leading question word settles it without running the regex
+        if words[0] not in _WH_SET and not _WH_RE.search(query_lower):
             return f"How do I resolve this WhatsApp API issue: {query}? Please provide detailed step-by-step instructions including any uninstall/reinstall steps if needed."
         
         # If the query already seems well-formed, leave it as is
         return query
     
+    @staticmethod
     def post_process(original_prompt, metrics, 
                         bert_threshold=0.5, 
                         f1_threshold=0.3, 
@@ -88,42 +127,42 @@ class QueryEnchancer:
         Returns:
             str: Either the original prompt (if quality is good) or an enhanced prompt
         """
-        is_acceptable, feedback = assess_response_quality(
-            metrics, bert_threshold, f1_threshold, bleu_threshold, combined_threshold
-        )
-        
-        if is_acceptable:
-            return original_prompt
-        
-        # Extract specific issues from feedback
-        bert_failed = metrics['bert_f1'] < bert_threshold
-        f1_failed = metrics['trad_f1'] < f1_threshold
-        bleu_failed = metrics['bleu'] < bleu_threshold
-        combined_failed = metrics.get('combined_score', 0) < combined_threshold
-        
-        # Create an enhanced prompt
-        enhanced_prompt = (
-            f"I need more detailed information about this issue. "
-            f"My previous question was:\n\n{original_prompt}\n\n"
-            f"The previous response had these quality issues:\n{feedback}\n\n"
-            f"Please provide a comprehensive answer with:\n"
+        # Rounded scores, as judged by assess_response_quality, so the cache can hit
+        return _build_improved_prompt(
+            original_prompt,
+            *rounded_scores(metrics),
+            bert_threshold,
+            f1_threshold,
+            bleu_threshold,
+            combined_threshold
         )
-        
-        # Add specific instructions based on which metrics failed
-        if bert_failed:
-            enhanced_prompt += "- Better semantic relevance to my specific question\n"
-        if f1_failed:
-            enhanced_prompt += "- More key technical terms and specific terminology\n"
-        if bleu_failed:
-            enhanced_prompt += "- Clearer structure similar to standard solutions\n"
-        if combined_failed:
-            enhanced_prompt += "- A more comprehensive and detailed response\n"
-        
-        # Add general improvements
-        enhanced_prompt += (
-            "- Step-by-step instructions\n"
-            "- Relevant technical details\n"
-            "- Any specific commands or settings needed\n"
-            "- Common pitfalls to avoid"
-        )
-        return enhanced_prompt
\ No newline at end of file
+
+
+@lru_cache(maxsize=2048)
+def _build_improved_prompt(original_prompt, bert_score, f1_score, bleu_score, combined_score,
+                           bert_threshold, f1_threshold, bleu_threshold, combined_threshold):
+    """Memoized core of QueryEnchancer.post_process."""
+    metrics = {
+        'bert_f1': bert_score,
+        'trad_f1': f1_score,
+        'bleu': bleu_score,
+        'combined_score': combined_score
+    }
+    is_acceptable, feedback, flags = assess_response_quality(
+        metrics, bert_threshold, f1_threshold, bleu_threshold, combined_threshold,
+        return_flags=True
+    )
+    
+    if is_acceptable:
+        return original_prompt
+    
+    # One request per failed metric, in the (bert, f1, bleu, combined) order of the flags
+    requests = [line for line, failed in zip(_FAILED_METRIC_REQUESTS, flags) if failed]
+    
+    return "".join([
+        _IMPROVED_PROMPT_HEADER, original_prompt,
+        _IMPROVED_PROMPT_ISSUES, feedback,
+        _IMPROVED_PROMPT_ASKS,
+        *requests,
+        _IMPROVED_PROMPT_FOOTER
+    ])
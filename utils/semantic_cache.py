@@ -0,0 +1,103 @@
+import os
+import pickle
+import logging
+import threading
+import numpy as np
+
+from metrics.sentence_encoder import load_sentence_encoder
+
+
+class SemanticCache:
+    def __init__(
+            self,
+            cache_path,
+            threshold=0.86,
+            model_name="paraphrase-albert-small-v2"
+    ):
+        """
+        Cache model responses keyed by a sentence embedding of the prompt.
+
+        A prompt whose cosine similarity to a cached prompt centroid reaches the
+        threshold reuses that centroid's response instead of calling the API.
+
+        Args:
+            cache_path (str): Pickle file used to persist the cache between runs.
+            threshold (float): Minimum cosine similarity for a cache hit.
+            model_name (str): sentence-transformers model used to embed prompts.
+        """
+        self.cache_path = cache_path
+        self.threshold = threshold
+        self.model_name = model_name
+        self.centroids = []
+        self.responses = []
+        self._matrix = None
+        # lookup() runs on a worker thread while add() runs on the event loop
+        self._lock = threading.Lock()
+        self._load()
+
+    def lookup(self, prompt):
+        """
+        Find a cached response for a semantically similar prompt.
+
+        Args:
+            prompt (str): The prompt about to be sent to the model.
+
+        Returns:
+            tuple: (cached response or None, prompt embedding). The embedding
+                can be passed to add() on a miss to avoid re-encoding.
+        """
+        embedding = self._embed(prompt)
+        with self._lock:
+            if not self.centroids:
+                return None, embedding
+            if self._matrix is None:
+                self._matrix = np.vstack(self.centroids)
+
+            # Embeddings are L2-normalised, so the dot product is the cosine similarity
+            sims = self._matrix @ embedding
+            best = int(sims.argmax())
+            if sims[best] >= self.threshold:
+                logging.debug(f"Semantic cache hit (cos={sims[best]:.4f})")
+                return self.responses[best], embedding
+        return None, embedding
+
+    def add(self, embedding, response):
+        """Store a response under the given prompt embedding."""
+        with self._lock:
+            self.centroids.append(embedding)
+            self.responses.append(response)
+            self._matrix = None
+
+    def save(self):
+        """Persist the cache to disk."""
+        os.makedirs(os.path.dirname(self.cache_path) or ".", exist_ok=True)
+        with self._lock, open(self.cache_path, 'wb') as f:
+            pickle.dump({
+                'model_name': self.model_name,
+                'centroids': self.centroids,
+                'responses': self.responses
+            }, f)
+        logging.debug(f"Saved {len(self.responses)} semantic cache entries to {self.cache_path}")
+
+    def _embed(self, text):
+        model = load_sentence_encoder(self.model_name)
+        return model.encode(text, normalize_embeddings=True).astype(np.float32)
+
+    def _load(self):
+        if not os.path.exists(self.cache_path):
+            return
+        try:
+            with open(self.cache_path, 'rb') as f:
+                data = pickle.load(f)
+        except Exception as e:
+            logging.warning(f"Could not read semantic cache {self.cache_path}: {e}")
+            return
+
+        # Embeddings from a different model are not comparable
+        if data.get('model_name') != self.model_name:
+            logging.info(f"Semantic cache was built with {data.get('model_name')}, starting fresh")
+            return
+
+        self.centroids = data.get('centroids', [])
+        self.responses = data.get('responses', [])
+        logging.info(f"Loaded {len(self.responses)} semantic cache entries")